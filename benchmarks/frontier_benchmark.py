@@ -0,0 +1,96 @@
+"""未訪問キューの取得順序のベンチマーク
+
+ナビゲーション用のページが多い架空のサイトを、幅優先（FIFO）と優先度付きキューで
+クロールし、同じ最大ページ数で取得できるアイテム数を比較する。
+
+使い方:
+    python benchmarks/frontier_benchmark.py [--max-pages 200]
+"""
+import argparse
+import os
+import random
+import sys
+from collections import deque
+from pathlib import Path
+from types import SimpleNamespace
+
+BASE_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BASE_DIR.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'scraping_project.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from scraper.frontier import CrawlFrontier, build_scorers  # noqa: E402
+
+
+def build_site(seed=0, categories=20, listing_pages=10, nav_pages=300):
+    """ページ毎の (リンク先のリスト, アイテム数) を持つ架空のサイトを作成
+
+    全ページの先頭にナビゲーション・フッターのリンクが並び、
+    アイテムのある一覧ページ（ページ送りあり）へのリンクはその後に続く。
+    """
+    rng = random.Random(seed)
+    site = {}
+    nav = [f'/info/{i}' for i in range(nav_pages)]
+    category_urls = [f'/category/{c}' for c in range(categories)]
+
+    footer = rng.sample(nav, 30)
+    site['/'] = (footer + category_urls, 0)
+    for url in nav:
+        site[url] = (rng.sample(nav, 30), 0)
+    for category_url in category_urls:
+        pages = [category_url] + [f'{category_url}/page/{p}' for p in range(2, listing_pages + 1)]
+        for i, page_url in enumerate(pages):
+            # 一覧ページは前後のページ送りへのリンクを持つ
+            pagination = pages[max(0, i - 1):i] + pages[i + 1:i + 3]
+            site[page_url] = (footer + pagination, 10)
+    return site
+
+
+def crawl(site, max_pages, max_depth, frontier=None):
+    """取得したページ数とアイテム数を返す"""
+    queue = frontier if frontier is not None else deque()
+    push = queue.push if frontier is not None else (lambda url, depth, **kw: queue.append((url, depth)))
+    pop = queue.pop if frontier is not None else queue.popleft
+
+    visited = set()
+    items = 0
+    push('/', 0)
+    while queue and len(visited) < max_pages:
+        url, depth = pop()
+        if url in visited:
+            continue
+        visited.add(url)
+        links, page_items = site[url]
+        items += page_items
+        if depth < max_depth:
+            for link in links:
+                if link not in visited:
+                    push(link, depth + 1, parent_items=page_items)
+    return len(visited), items
+
+
+def run(max_pages, max_depth):
+    site = build_site()
+    target = SimpleNamespace(priority_patterns='/category/', deprioritize_patterns='/info/')
+    no_patterns = SimpleNamespace(priority_patterns='', deprioritize_patterns='')
+
+    print(f"Pages in site: {len(site):,}  (max pages: {max_pages}, max depth: {max_depth})")
+    print(f"{'frontier':<28}{'pages':>8}{'items':>8}{'items/page':>12}")
+    for name, frontier in [
+        ('FIFO (deque)', None),
+        ('priority (default scorers)', CrawlFrontier(build_scorers(no_patterns))),
+        ('priority (+ URL patterns)', CrawlFrontier(build_scorers(target))),
+    ]:
+        pages, items = crawl(site, max_pages, max_depth, frontier)
+        print(f"{name:<28}{pages:>8}{items:>8}{items / pages:>12.2f}")
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument('--max-pages', type=int, default=200, help='最大ページ数')
+    arg_parser.add_argument('--max-depth', type=int, default=5, help='最大深度')
+    args = arg_parser.parse_args()
+    run(args.max_pages, args.max_depth)
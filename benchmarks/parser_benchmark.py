@@ -0,0 +1,77 @@
+"""HTMLパーサーのベンチマーク
+
+保存済みのフィクスチャページに対して、各パーサーで解析とセレクタ抽出を行い、
+処理時間と抽出結果が html.parser と一致するかを比較する。
+
+使い方:
+    python benchmarks/parser_benchmark.py [--repeat 20]
+"""
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BASE_DIR.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'scraping_project.settings')
+
+from scraper.parsers import PARSER_CHOICES, get_parser  # noqa: E402
+
+# フィクスチャ毎の (データ抽出用セレクタ, リンクセレクタ)
+FIXTURES = {
+    'news_listing.html': ('h2.article-title a, .summary', 'a[href]'),
+    'shop_listing_sjis.html': ('.product-title a, .price', '.products a[href]'),
+    'blog_article.html': ('h1.entry-title, .entry-content p', 'a.related-link, .entry-content a[href]'),
+}
+
+
+def extract(parser, content, css_selector, link_selector):
+    """解析してテキストとリンクを抽出"""
+    document = parser.parse(content)
+    items = [
+        (parser.get_text(element), parser.get_attribute(element, 'href'))
+        for element in parser.select(document, css_selector)
+    ]
+    links = [
+        parser.get_attribute(element, 'href')
+        for element in parser.select(document, link_selector)
+    ]
+    return items, links
+
+
+def run(repeat):
+    names = [name for name, _ in PARSER_CHOICES]
+
+    print(f"{'fixture':<26}{'parser':<14}{'items':>7}{'links':>7}{'ms/page':>10}{'speedup':>9}  match")
+    for fixture, (css_selector, link_selector) in FIXTURES.items():
+        content = (BASE_DIR / 'fixtures' / fixture).read_bytes()
+        baseline = None
+        baseline_time = None
+
+        for name in names:
+            parser = get_parser(name)
+            if parser.name != name:
+                print(f"{fixture:<26}{name:<14}  (not installed)")
+                continue
+
+            started = time.perf_counter()
+            for _ in range(repeat):
+                items, links = extract(parser, content, css_selector, link_selector)
+            elapsed = (time.perf_counter() - started) / repeat * 1000
+
+            if baseline is None:
+                baseline = (items, links)
+                baseline_time = elapsed
+
+            match = 'OK' if (items, links) == baseline else 'DIFF'
+            print(
+                f"{fixture:<26}{name:<14}{len(items):>7}{len(links):>7}"
+                f"{elapsed:>10.1f}{baseline_time / elapsed:>8.1f}x  {match}"
+            )
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument('--repeat', type=int, default=20, help='各パーサーの繰り返し回数')
+    run(arg_parser.parse_args().repeat)
@@ -0,0 +1,82 @@
+"""訪問済みURL管理のベンチマーク
+
+Pythonのset（生のURL文字列）とBloomフィルターについて、
+100万URLあたりのメモリ使用量・追加/判定時間・誤判定率を比較する。
+
+使い方:
+    python benchmarks/visited_set_benchmark.py [--urls 1000000] [--error-rate 0.001]
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BASE_DIR.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'scraping_project.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from scraper.bloom import BloomFilter  # noqa: E402
+from scraper.url_utils import canonicalize_url  # noqa: E402
+
+
+def generate_urls(count, prefix='page'):
+    """実際のクロールに近い長さのURLを生成"""
+    for i in range(count):
+        yield f'https://www.example.com/category/{i % 500}/{prefix}-{i}/index.html?lang=ja&sort=new'
+
+
+def measure(factory, urls, probes):
+    """追加後のメモリ使用量と処理時間を計測"""
+    tracemalloc.start()
+    started = time.perf_counter()
+    visited = factory()
+    for url in urls:
+        visited.add(url)
+    add_time = time.perf_counter() - started
+    memory, _ = tracemalloc.get_traced_memory()
+
+    started = time.perf_counter()
+    false_positives = sum(1 for url in probes if url in visited)
+    lookup_time = time.perf_counter() - started
+    tracemalloc.stop()
+
+    return memory, add_time, lookup_time, false_positives
+
+
+def run(count, error_rate):
+    urls = list(generate_urls(count))
+    probes = list(generate_urls(min(count, 100000), prefix='unseen'))
+    scale = 1000000 / count
+
+    print(f"URLs: {count:,}  (error rate: {error_rate})")
+    print(f"{'structure':<14}{'MB/1M URLs':>12}{'add us/url':>12}{'lookup us':>11}{'false pos':>11}")
+    for name, factory in [
+        ('set', set),
+        ('BloomFilter', lambda: BloomFilter(count, error_rate)),
+    ]:
+        memory, add_time, lookup_time, false_positives = measure(factory, urls, probes)
+        print(
+            f"{name:<14}{memory * scale / 1024 / 1024:>12.1f}"
+            f"{add_time / count * 1e6:>12.2f}{lookup_time / len(probes) * 1e6:>11.2f}"
+            f"{false_positives / len(probes):>11.4%}"
+        )
+
+    started = time.perf_counter()
+    for url in urls[:100000]:
+        canonicalize_url(url)
+    elapsed = (time.perf_counter() - started) / min(count, 100000) * 1e6
+    print(f"canonicalize_url: {elapsed:.2f} us/url")
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument('--urls', type=int, default=1000000, help='追加するURL数')
+    arg_parser.add_argument('--error-rate', type=float, default=0.001, help='Bloomフィルターの誤判定率')
+    args = arg_parser.parse_args()
+    run(args.urls, args.error_rate)
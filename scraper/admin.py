@@ -1,36 +1,67 @@
 from django.contrib import admin
-from .models import ScrapingTarget, ScrapedData, ScrapingJob
+from django.contrib.admin.views.main import ChangeList, ORDER_VAR
+from .models import ScrapingTarget, ScrapedData, ScrapingJob, HttpCacheEntry, PageState
+from .search import search_scraped_data
 
 
 @admin.register(ScrapingTarget)
 class ScrapingTargetAdmin(admin.ModelAdmin):
-    list_display = ['name', 'url', 'is_active', 'enable_crawling', 'max_depth', 'max_pages', 'created_at']
+    list_display = ['name', 'url', 'is_active', 'enable_crawling', 'max_depth', 'max_pages', 'items_count', 'created_at']
     list_filter = ['is_active', 'enable_crawling', 'created_at']
     search_fields = ['name', 'url']
-    readonly_fields = ['created_at', 'updated_at']
+    readonly_fields = ['items_count', 'created_at', 'updated_at']
     
     fieldsets = (
         ('基本設定', {
             'fields': ('name', 'url', 'css_selector', 'is_active')
         }),
         ('クロール設定', {
-            'fields': ('enable_crawling', 'max_depth', 'max_pages', 'link_selector', 'allowed_domains', 'exclude_patterns'),
+            'fields': ('enable_crawling', 'max_depth', 'max_pages', 'link_selector', 'allowed_domains', 'exclude_patterns', 'priority_patterns', 'deprioritize_patterns', 'use_sitemap', 'respect_robots_txt'),
             'description': 'サイト全体をクロールする場合の設定'
         }),
+        ('パフォーマンス設定', {
+            'fields': ('async_crawl', 'distributed_crawl', 'concurrency', 'per_domain_concurrency', 'rate_limit', 'rate_limit_burst', 'auto_throttle', 'html_parser', 'use_http_cache'),
+            'description': '並列取得・レート制限・HTML解析の設定'
+        }),
+        ('JavaScript描画設定', {
+            'fields': ('scraping_method', 'wait_strategy', 'wait_selector', 'wait_timeout', 'render_profile', 'blocked_url_patterns'),
+            'description': 'Seleniumでページを取得する場合の設定'
+        }),
         ('システム情報', {
-            'fields': ('created_at', 'updated_at'),
+            'fields': ('items_count', 'created_at', 'updated_at'),
             'classes': ('collapse',)
         })
     )
 
 
+class ScrapedDataChangeList(ChangeList):
+    def get_ordering(self, request, queryset):
+        # 検索時は関連度順（並べ替えを指定した場合はそちらを優先）
+        if self.query.strip() and ORDER_VAR not in self.params:
+            return ['-rank', '-pk']
+        return super().get_ordering(request, queryset)
+
+
 @admin.register(ScrapedData)
 class ScrapedDataAdmin(admin.ModelAdmin):
-    list_display = ['target', 'title', 'url', 'depth', 'scraped_at']
+    list_display = ['target', 'title', 'url', 'depth', 'scraped_at', 'last_seen_at']
     list_filter = ['target', 'depth', 'scraped_at']
-    search_fields = ['title', 'content', 'url']
-    readonly_fields = ['scraped_at']
+    # 検索は全文検索インデックスを使う（get_search_results を参照）
+    search_fields = ['title', 'content']
+    search_help_text = 'タイトル・内容を全文検索します（関連度順）'
+    readonly_fields = ['scraped_at', 'last_seen_at', 'fingerprint']
     date_hierarchy = 'scraped_at'
+    
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        return search_scraped_data(queryset, search_term), False
+    
+    def get_changelist(self, request, **kwargs):
+        return ScrapedDataChangeList
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).defer('search_vector')
 
 
 @admin.register(ScrapingJob)
@@ -38,4 +69,20 @@ class ScrapingJobAdmin(admin.ModelAdmin):
     list_display = ['target', 'status', 'started_at', 'completed_at', 'items_scraped']
     list_filter = ['status', 'target', 'started_at']
     readonly_fields = ['started_at', 'completed_at']
-    date_hierarchy = 'started_at'
\ No newline at end of file
+    date_hierarchy = 'started_at'
+
+
+@admin.register(HttpCacheEntry)
+class HttpCacheEntryAdmin(admin.ModelAdmin):
+    list_display = ['target', 'url', 'etag', 'last_modified', 'fetched_at', 'last_accessed_at']
+    list_filter = ['target']
+    search_fields = ['url']
+    readonly_fields = ['fetched_at', 'last_accessed_at', 'selector_hash']
+
+
+@admin.register(PageState)
+class PageStateAdmin(admin.ModelAdmin):
+    list_display = ['target', 'url', 'check_count', 'change_count', 'last_changed_at', 'next_crawl_at']
+    list_filter = ['target']
+    search_fields = ['url']
+    readonly_fields = ['content_hash', 'last_crawled_at', 'last_changed_at']
@@ -1,6 +1,23 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+def _install_search_index(sender, using, **kwargs):
+    from .search import install_search_index
+    install_search_index(using)
+
+
+def _create_partitions(sender, using, **kwargs):
+    from .partitions import create_partitions
+    create_partitions(using)
 
 
 class ScraperConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'scraper' 
\ No newline at end of file
+    name = 'scraper'
+
+    def ready(self):
+        # 全文検索のトリガー・インデックスはモデルで表現できないため、マイグレーション後に作成する
+        post_migrate.connect(_install_search_index, sender=self)
+        # パーティション化したテーブルでは今後の期間のパーティションを用意する
+        post_migrate.connect(_create_partitions, sender=self)
@@ -0,0 +1,319 @@
+import asyncio
+import itertools
+import logging
+import time
+from urllib.parse import urlparse
+
+import aiohttp
+from asgiref.sync import sync_to_async
+
+from .crawler import WebCrawler
+from .throttle import CONNECTION_ERROR_STATUS
+from .url_utils import canonicalize_url
+
+logger = logging.getLogger(__name__)
+
+
+class _CheckpointMarker:
+    """出力キュー上でチェックポイントの位置を示すマーカー"""
+
+    def __init__(self, state):
+        self.state = state
+
+
+class _PageMarker:
+    """出力キュー上で1ページ分のアイテムの終わりを示すマーカー"""
+
+    def __init__(self, url, depth, items, not_modified):
+        self.url = url
+        self.depth = depth
+        self.items = items
+        self.not_modified = not_modified
+
+
+class _ConcurrencyLimiter:
+    """上限を途中で変更できる同時実行数の制限"""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.active = 0
+        self._condition = asyncio.Condition()
+
+    async def set_limit(self, limit):
+        async with self._condition:
+            self.limit = limit
+            self._condition.notify_all()
+
+    async def __aenter__(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.active < self.limit)
+            self.active += 1
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        async with self._condition:
+            self.active -= 1
+            self._condition.notify_all()
+
+
+class AsyncWebCrawler(WebCrawler):
+    """asyncioで複数ページを並列に取得するクローラー"""
+
+    def __init__(self, target, scraping_engine, **kwargs):
+        super().__init__(target, scraping_engine, **kwargs)
+        self.concurrency = max(1, target.concurrency)
+        self.per_domain_concurrency = max(1, target.per_domain_concurrency)
+        self.domain_limiters = {}
+        self.item_queue = None
+
+        # キュー投入済みで処理が完了していないページ（URL -> (深度, 優先度)）
+        self.pending = {}
+        self.pages_finished = 0
+        self._sequence = itertools.count()
+
+    def get_state(self):
+        """再開用のクロール状態を返す（処理中のページは未訪問として扱う）"""
+        return {
+            'frontier': [[url, depth, priority] for url, (depth, priority) in self.pending.items()],
+            'visited_urls': self._dump_visited(exclude={canonicalize_url(url) for url in self.pending}),
+            'pages_crawled': self.pages_crawled - len(self.pending),
+        }
+
+    def _get_domain_limiter(self, domain):
+        """ドメイン毎の同時接続数制限を取得"""
+        if domain not in self.domain_limiters:
+            self.domain_limiters[domain] = _ConcurrencyLimiter(self.per_domain_concurrency)
+        return self.domain_limiters[domain]
+
+    async def _record_response(self, domain, latency, status, retry_after=None):
+        """レスポンスの結果を自動スロットリングに反映し、同時接続数の上限を更新"""
+        delay = await self.throttle.record_async(domain, latency, status, retry_after)
+        limit = min(self.per_domain_concurrency, self.throttle.concurrency(domain))
+        await self._get_domain_limiter(domain).set_limit(limit)
+        return delay
+
+    def _enqueue(self, queue, url, depth, priority=None, **context):
+        """URLをキューに追加（訪問済み・最大ページ数をチェック）"""
+        # 訪問済みは正規化したURLで判定する（取得には元のURLを使う）
+        key = canonicalize_url(url)
+        if key in self.visited_urls or self.pages_crawled >= self.max_pages:
+            return
+
+        # 並列取得中の重複を防ぐため、キュー投入時点で訪問済みとする
+        self.visited_urls.add(key)
+        self._put(queue, url, depth, priority, **context)
+
+    def _put(self, queue, url, depth, priority=None, **context):
+        """優先度を付けてキューに追加"""
+        if priority is None:
+            priority = self.url_queue.score(url, depth, **context)
+        self.pages_crawled += 1
+        self.pending[url] = (depth, priority)
+        queue.put_nowait((-priority, next(self._sequence), url, depth))
+
+    async def _fetch(self, session, url):
+        """ページを取得"""
+        response_cache = self.scraping_engine.response_cache
+        headers = {}
+        if response_cache:
+            headers = await sync_to_async(response_cache.conditional_headers)(url)
+
+        domain = urlparse(url).netloc
+        if domain not in self._prepared_domains:
+            await sync_to_async(self._prepare_domain)(url)
+
+        async with self._get_domain_limiter(domain):
+            attempt = 0
+            while True:
+                await self.rate_limiter.acquire_async(domain)
+                started = time.monotonic()
+                try:
+                    response = await session.get(url, headers=headers)
+                except (aiohttp.ClientError, asyncio.TimeoutError):
+                    if self.throttle:
+                        await self._record_response(domain, time.monotonic() - started, CONNECTION_ERROR_STATUS)
+                    raise
+
+                async with response:
+                    if self.throttle:
+                        delay = await self._record_response(
+                            domain, time.monotonic() - started, response.status, response.headers.get('Retry-After')
+                        )
+                        # 429/503の場合はRetry-Afterの時刻まで待ってから再取得する
+                        if self.throttle.should_retry(response.status, attempt):
+                            logger.warning(
+                                f"Throttled by {domain} ({response.status}), retrying {url} (delay: {delay:.2f}s)"
+                            )
+                            attempt += 1
+                            continue
+
+                    # 前回から変更がない場合は本文を取得しない
+                    if response.status == 304:
+                        logger.info(f"Not modified: {url}")
+                        await sync_to_async(response_cache.mark_not_modified)(url)
+                        return self.scraping_engine.build_page(None, url, not_modified=True)
+
+                    response.raise_for_status()
+                    content = await response.read()
+                break
+
+        if response_cache:
+            await sync_to_async(response_cache.store)(url, response.headers, len(content))
+        # 相対URLはリダイレクト後のURLを基準に解決する
+        return self.scraping_engine.build_page(content, str(response.url))
+
+    async def _crawl_page(self, session, queue, url, depth):
+        """単一ページを取得してアイテムとリンクを抽出"""
+        logger.info(f"Crawling: {url} (depth: {depth})")
+
+        try:
+            page = await self._fetch(session, url)
+        except Exception as e:
+            logger.error(f"Page scraping error for {url}: {e}")
+            return
+
+        results = []
+        extracted = True
+        if not page.not_modified:
+            try:
+                results = self.scraping_engine.extract_items(page, page.url, self.target.css_selector)
+            except Exception as e:
+                logger.error(f"Page scraping error for {url}: {e}")
+                extracted = False
+
+        scraped_items = [
+            {'title': result['title'], 'content': result['content'], 'url': url, 'depth': depth}
+            for result in results
+        ]
+        for item in scraped_items:
+            # 出力キューが満杯の場合は消費されるまで待機（メモリ使用量を一定に保つ）
+            await self.item_queue.put(item)
+        self.items_scraped += len(scraped_items)
+
+        if self.page_callback and extracted:
+            await self.item_queue.put(_PageMarker(url, depth, scraped_items, page.not_modified))
+
+        logger.info(f"Scraped {len(results)} items from {url}")
+
+        # 次の深度のリンクをキューに追加
+        if depth < self.max_depth:
+            links = await sync_to_async(self._extract_links)(page, url)
+            for link in links:
+                self._enqueue(queue, link, depth + 1, parent_items=len(scraped_items))
+
+    async def _worker(self, session, queue):
+        """キューからURLを取り出して処理するワーカー"""
+        while True:
+            _, _, url, depth = await queue.get()
+            try:
+                await self._crawl_page(session, queue, url, depth)
+            finally:
+                # 後処理で例外が発生してもqueue.join()が終わるよう、先に完了を通知する
+                queue.task_done()
+                self.pending.pop(url, None)
+                self.pages_finished += 1
+
+            # このページのアイテムより後ろにマーカーを置き、その時点の状態を記録する
+            if self.checkpoint_callback and self.pages_finished % self.checkpoint_interval == 0:
+                await self.item_queue.put(_CheckpointMarker(self.get_state()))
+
+    async def crawl_async(self, item_queue):
+        """非同期クロール実行（取得したアイテムはitem_queueに追加し、最後にNoneを追加）"""
+        self.item_queue = item_queue
+        try:
+            await self._run_workers()
+        except asyncio.CancelledError:
+            # 消費側が終了した場合は終端を通知する必要はない
+            raise
+        except Exception:
+            await item_queue.put(None)
+            raise
+        await item_queue.put(None)
+
+        logger.info(f"Crawl completed. Pages: {self.pages_crawled}, Items: {self.items_scraped}")
+
+    async def _run_workers(self):
+        """ワーカーを起動してクロールが終わるまで待機"""
+        logger.info(f"Starting async crawl for {self.target.name}")
+        logger.info(
+            f"Max depth: {self.max_depth}, Max pages: {self.max_pages}, "
+            f"Concurrency: {self.concurrency} (per domain: {self.per_domain_concurrency})"
+        )
+
+        connector = aiohttp.TCPConnector(
+            limit=self.concurrency,
+            limit_per_host=self.per_domain_concurrency
+        )
+        timeout = aiohttp.ClientTimeout(total=30)
+        headers = {
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+        }
+
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout, headers=headers) as session:
+            # 優先度の高いURLから取得する
+            queue = asyncio.PriorityQueue()
+            if self.resumed:
+                # 保存されたキューから続行
+                frontier = self.url_queue.items()
+                self.url_queue.clear()
+                # Bloomフィルターの場合は処理中だったURLも訪問済みに含まれるため、訪問済みでは判定せずに追加する
+                # （同期クローラーのキューは重複を含むため、同じURLは最初の1件のみ追加する）
+                restored = set()
+                for url, depth, priority in frontier:
+                    key = canonicalize_url(url)
+                    if key in restored:
+                        continue
+                    restored.add(key)
+                    self.visited_urls.add(key)
+                    self._put(queue, url, depth, priority)
+            else:
+                self._enqueue(queue, self.target.url, 0)
+
+                # サイトマップのURLはナビゲーションを辿らずに直接キューに追加
+                if self.target.use_sitemap:
+                    seeds = await sync_to_async(self._discover_seed_urls)()
+                    for url, lastmod, priority in seeds:
+                        self._enqueue(queue, url, 1, sitemap_priority=priority, lastmod=lastmod)
+
+            workers = [
+                asyncio.create_task(self._worker(session, queue))
+                for _ in range(self.concurrency)
+            ]
+
+            try:
+                await queue.join()
+            finally:
+                for worker in workers:
+                    worker.cancel()
+                await asyncio.gather(*workers, return_exceptions=True)
+
+    def crawl(self):
+        """クロール実行（取得したアイテムを順次返すジェネレーター）
+
+        イベントループを呼び出し元のスレッドで進め、アイテムが揃う度に返す。
+        消費側がデータベースに保存している間はクロールも一時停止する。
+        """
+        loop = asyncio.new_event_loop()
+        item_queue = asyncio.Queue(maxsize=self.concurrency * 10)
+        crawl_task = loop.create_task(self.crawl_async(item_queue))
+
+        try:
+            while True:
+                item = loop.run_until_complete(item_queue.get())
+                if item is None:
+                    break
+                if isinstance(item, _PageMarker):
+                    self.page_callback(item.url, item.depth, item.items, item.not_modified)
+                    continue
+                if isinstance(item, _CheckpointMarker):
+                    # マーカーより前のアイテムは全て消費済み
+                    self.checkpoint_callback(item.state)
+                    continue
+                yield item
+
+            # クロール中の例外を呼び出し元に伝える
+            loop.run_until_complete(crawl_task)
+        finally:
+            if not crawl_task.done():
+                crawl_task.cancel()
+                loop.run_until_complete(asyncio.gather(crawl_task, return_exceptions=True))
+            loop.close()
@@ -0,0 +1,65 @@
+import base64
+import hashlib
+import math
+
+
+class BloomFilter:
+    """メモリ使用量が一定のBloomフィルター（訪問済みURLの判定用）
+
+    追加した要素は必ず「含まれる」と判定されるが、追加していない要素を
+    error_rate の確率で「含まれる」と誤判定する。要素の列挙・削除はできない。
+    """
+
+    def __init__(self, capacity, error_rate=0.001):
+        self.capacity = max(1, capacity)
+        self.error_rate = error_rate
+
+        # 最適なビット数とハッシュ関数の数
+        self.num_bits = max(8, int(-self.capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / self.capacity * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item):
+        """ダブルハッシュ法でビット位置を計算"""
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def add(self, item):
+        added = False
+        for position in self._positions(item):
+            byte, bit = divmod(position, 8)
+            if not self.bits[byte] & (1 << bit):
+                self.bits[byte] |= 1 << bit
+                added = True
+        if added:
+            self.count += 1
+
+    def __contains__(self, item):
+        for position in self._positions(item):
+            byte, bit = divmod(position, 8)
+            if not self.bits[byte] & (1 << bit):
+                return False
+        return True
+
+    def __len__(self):
+        """追加された要素数（近似値）"""
+        return self.count
+
+    def to_dict(self):
+        """JSONに保存できる形式に変換"""
+        return {
+            'capacity': self.capacity,
+            'error_rate': self.error_rate,
+            'count': self.count,
+            'bits': base64.b64encode(self.bits).decode('ascii'),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        bloom = cls(data['capacity'], data['error_rate'])
+        bloom.bits = bytearray(base64.b64decode(data['bits']))
+        bloom.count = data['count']
+        return bloom
@@ -1,10 +1,13 @@
-import requests
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin, urlparse
-import time
+from django.conf import settings
+from urllib.parse import urldefrag, urljoin, urlparse
 import logging
-from collections import deque
 import re
+from .bloom import BloomFilter
+from .frontier import CrawlFrontier, build_scorers
+from .rate_limit import DomainRateLimiter
+from .robots import RobotsCache
+from .sitemaps import iter_sitemap_urls
+from .url_utils import canonicalize_url, normalize_netloc
 
 logger = logging.getLogger(__name__)
 
@@ -12,12 +15,20 @@ logger = logging.getLogger(__name__)
 class WebCrawler:
     """Webサイト全体をクロールするクラス"""
     
-    def __init__(self, target, scraping_engine):
+    def __init__(self, target, scraping_engine, checkpoint_callback=None, checkpoint_interval=20,
+                 page_callback=None):
         self.target = target
         self.scraping_engine = scraping_engine
-        self.visited_urls = set()
-        self.url_queue = deque()
-        self.scraped_data = []
+        # 優先度付きの未訪問キュー（スコアの高いURLから取得）
+        self.url_queue = CrawlFrontier(build_scorers(target))
+        self.resumed = False
+        
+        # チェックポイント（checkpoint_interval ページ毎に状態を通知）
+        self.checkpoint_callback = checkpoint_callback
+        self.checkpoint_interval = max(1, checkpoint_interval)
+        
+        # ページ毎の取得結果の通知先（URL, 深度, アイテム, 304かどうか）
+        self.page_callback = page_callback
         
         # 設定
         self.max_depth = target.max_depth
@@ -25,19 +36,86 @@ class WebCrawler:
         self.link_selector = target.link_selector
         self.allowed_domains = self._parse_allowed_domains()
         self.exclude_patterns = self._parse_exclude_patterns()
+        self.visited_urls = self._create_visited_set()
+        
+        # ドメイン毎のレート制限（自動スロットリングが有効な場合は全タスクで共有、それ以外はトークンバケット）
+        self.throttle = scraping_engine.throttle
+        self.rate_limiter = self.throttle or DomainRateLimiter(target.rate_limit, target.rate_limit_burst)
+        
+        # robots.txt（Disallow・Crawl-delayの遵守とサイトマップの検出に使用）
+        self.robots = RobotsCache(scraping_engine.session)
+        self.respect_robots_txt = target.respect_robots_txt
+        self._prepared_domains = set()
         
         # 統計
         self.pages_crawled = 0
+        self.items_scraped = 0
+        
+    def _create_visited_set(self):
+        """訪問済みURLの管理方法を選択
+        
+        最大ページ数が SCRAPER_BLOOM_FILTER_THRESHOLD 以上の大規模クロールでは、
+        メモリ使用量を抑えるためにBloomフィルターを使用する。
+        """
+        threshold = getattr(settings, 'SCRAPER_BLOOM_FILTER_THRESHOLD', 100000)
+        if self.max_pages >= threshold:
+            error_rate = getattr(settings, 'SCRAPER_BLOOM_FILTER_ERROR_RATE', 0.001)
+            return BloomFilter(self.max_pages, error_rate)
+        return set()
+    
+    def _dump_visited(self, exclude=()):
+        """訪問済みURLを保存用の形式に変換（Bloomフィルターは除外できないためそのまま）"""
+        if isinstance(self.visited_urls, BloomFilter):
+            return self.visited_urls.to_dict()
+        return [url for url in self.visited_urls if url not in exclude]
+    
+    def get_state(self):
+        """再開用のクロール状態（未訪問キュー・訪問済みURL）を返す"""
+        return {
+            'frontier': [[url, depth, priority] for url, depth, priority in self.url_queue.items()],
+            'visited_urls': self._dump_visited(),
+            'pages_crawled': self.pages_crawled,
+        }
+    
+    def restore_state(self, state):
+        """保存されたクロール状態から再開できるように復元"""
+        self.url_queue.clear()
+        for entry in state['frontier']:
+            # 優先度を保存していない古いチェックポイントは再計算する
+            priority = entry[2] if len(entry) > 2 else None
+            self.url_queue.push(entry[0], entry[1], priority)
+        visited_urls = state['visited_urls']
+        if isinstance(visited_urls, dict):
+            self.visited_urls = BloomFilter.from_dict(visited_urls)
+        else:
+            self.visited_urls = self._create_visited_set()
+            for url in visited_urls:
+                self.visited_urls.add(url)
+        self.pages_crawled = state['pages_crawled']
+        self.resumed = True
+        logger.info(
+            f"Resuming crawl for {self.target.name}: "
+            f"{self.pages_crawled} pages crawled, {len(self.url_queue)} URLs in queue"
+        )
+    
+    def _checkpoint(self):
+        """チェックポイントを通知
         
+        呼び出し時点までに返したアイテムは全て消費済みのため、
+        コールバック側で保存してから状態を記録すれば取りこぼしは発生しない。
+        """
+        if self.checkpoint_callback and self.pages_crawled % self.checkpoint_interval == 0:
+            self.checkpoint_callback(self.get_state())
+    
     def _parse_allowed_domains(self):
         """許可ドメインを解析"""
         if self.target.allowed_domains.strip():
-            domains = [d.strip() for d in self.target.allowed_domains.split('\n') if d.strip()]
+            domains = [d.strip().lower() for d in self.target.allowed_domains.split('\n') if d.strip()]
             return domains
         else:
             # デフォルトは開始URLと同じドメイン
             parsed = urlparse(self.target.url)
-            return [parsed.netloc]
+            return [normalize_netloc(parsed.scheme, parsed.netloc)]
     
     def _parse_exclude_patterns(self):
         """除外パターンを解析"""
@@ -55,8 +133,9 @@ class WebCrawler:
             if parsed.scheme not in ['http', 'https']:
                 return False
             
-            # ドメインチェック
-            if parsed.netloc not in self.allowed_domains:
+            # ドメインチェック（大文字やデフォルトポートの有無の違いは同じドメインとみなす）
+            netloc = normalize_netloc(parsed.scheme, parsed.netloc)
+            if netloc not in self.allowed_domains and parsed.netloc.lower() not in self.allowed_domains:
                 return False
             
             # 除外パターンチェック
@@ -64,8 +143,12 @@ class WebCrawler:
                 if pattern.search(url):
                     return False
             
-            # 既に訪問済みかチェック
-            if url in self.visited_urls:
+            # 既に訪問済みかチェック（訪問済みは正規化したURLで記録している）
+            if canonicalize_url(url) in self.visited_urls:
+                return False
+            
+            # robots.txtで禁止されていないかチェック
+            if self.respect_robots_txt and not self.robots.can_fetch(url):
                 return False
             
             return True
@@ -73,100 +156,179 @@ class WebCrawler:
         except Exception:
             return False
     
-    def _extract_links(self, html_content, base_url):
-        """HTMLからリンクを抽出"""
+    def _extract_links(self, page, base_url):
+        """解析済みページからリンクを抽出"""
+        response_cache = self.scraping_engine.response_cache
+        
         try:
-            soup = BeautifulSoup(html_content, 'html.parser')
-            links = soup.select(self.link_selector)
-            
-            extracted_urls = []
-            for link in links:
-                href = link.get('href')
-                if href:
-                    # 相対URLを絶対URLに変換
-                    absolute_url = urljoin(base_url, href)
-                    
-                    # フラグメント（#以降）を除去
-                    if '#' in absolute_url:
-                        absolute_url = absolute_url.split('#')[0]
-                    
-                    if self._is_valid_url(absolute_url):
-                        extracted_urls.append(absolute_url)
-            
-            return extracted_urls
+            if page.not_modified:
+                # 変更がないページは前回抽出したリンクを再利用
+                absolute_urls = response_cache.get_links(base_url)
+            else:
+                # 相対URLは取得したページのURL（リダイレクト後）を基準に解決し、
+                # 正規化したURLが同じリンクは最初のものだけを残す
+                links = {}
+                for link in page.select(self.link_selector):
+                    href = page.parser.get_attribute(link, 'href')
+                    if href:
+                        absolute_url = urldefrag(urljoin(page.url or base_url, href))[0]
+                        links.setdefault(canonicalize_url(absolute_url), absolute_url)
+                absolute_urls = list(links.values())
+                
+                if response_cache:
+                    response_cache.store_links(base_url, absolute_urls)
+            
+            return [url for url in absolute_urls if self._is_valid_url(url)]
             
         except Exception as e:
             logger.error(f"Link extraction error: {e}")
             return []
     
+    def get_crawl_rate(self, url):
+        """ドメイン毎のリクエストレート（robots.txtのCrawl-delayがあればそれ以下に制限）"""
+        rate = self.target.rate_limit
+        if self.respect_robots_txt:
+            delay = self.robots.crawl_delay(url)
+            if delay:
+                rate = min(rate, 1.0 / delay) if rate > 0 else 1.0 / delay
+        return rate
+    
+    def _prepare_domain(self, url):
+        """ドメインに初めてアクセスする前にCrawl-delayをレート制限に反映"""
+        domain = urlparse(url).netloc
+        if domain in self._prepared_domains:
+            return
+        self._prepared_domains.add(domain)
+        
+        rate = self.get_crawl_rate(url)
+        if rate != self.target.rate_limit:
+            logger.info(f"Applying robots.txt crawl delay for {domain}: {rate:.3f} requests/s")
+            # Crawl-delayは1リクエスト毎の間隔のため、バーストは許可しない
+            self.rate_limiter.set_rate(domain, rate, capacity=1)
+    
+    def _discover_seed_urls(self):
+        """robots.txtとサイトマップから初期URLを収集
+        
+        サイトマップに記載されたURLを (URL, lastmod, priority) のリストで返す。
+        robots.txtにサイトマップの記載がない場合は /sitemap.xml を試す。
+        """
+        start_url = self.target.url
+        sitemap_urls = self.robots.sitemaps(start_url) or [urljoin(start_url, '/sitemap.xml')]
+        
+        seeds = []
+        entries = iter_sitemap_urls(
+            self.scraping_engine.session,
+            sitemap_urls,
+            max_urls=self.max_pages,
+            max_sitemaps=getattr(settings, 'SCRAPER_SITEMAP_MAX_SITEMAPS', 50)
+        )
+        for entry in entries:
+            url = urldefrag(entry.url)[0]
+            if self._is_valid_url(url):
+                seeds.append((url, entry.lastmod, entry.priority))
+        
+        logger.info(f"Seeded {len(seeds)} URLs from sitemaps for {self.target.name}")
+        return seeds
+    
     def _scrape_page(self, url, depth):
-        """単一ページをスクレイピング"""
+        """単一ページをスクレイピングし、取得したアイテムのリストとページのタプルを返す
+
+        取得に失敗した場合のページはNone。
+        """
         try:
-            # スクレイピング実行
-            results = self.scraping_engine.scrape(url, self.target.css_selector)
+            # スクレイピング実行（取得したページはリンク抽出にも再利用する）
+            results, page = self.scraping_engine.scrape_page(url, self.target.css_selector)
             
-            # 結果を保存
+            scraped_items = []
             for result in results:
-                scraped_item = {
+                scraped_items.append({
                     'title': result['title'],
                     'content': result['content'],
                     'url': url,
                     'depth': depth
-                }
-                self.scraped_data.append(scraped_item)
+                })
             
-            # HTMLを取得してリンクを抽出（次の深度用）
+            # リンクを抽出（次の深度用）
             if depth < self.max_depth:
-                try:
-                    headers = {
-                        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-                    }
-                    response = requests.get(url, headers=headers, timeout=30)
-                    response.raise_for_status()
-                    
-                    links = self._extract_links(response.text, url)
-                    
-                    # 新しいリンクをキューに追加
-                    for link in links:
-                        if link not in self.visited_urls and self.pages_crawled < self.max_pages:
-                            self.url_queue.append((link, depth + 1))
-                    
-                except Exception as e:
-                    logger.warning(f"Link extraction failed for {url}: {e}")
-            
-            return len(results)
+                links = self._extract_links(page, url)
+                
+                # 新しいリンクをキューに追加（アイテムが取得できたページからのリンクは優先度が上がる）
+                for link in links:
+                    if canonicalize_url(link) not in self.visited_urls and self.pages_crawled < self.max_pages:
+                        self.url_queue.push(link, depth + 1, parent_items=len(scraped_items))
+            
+            return scraped_items, page
             
         except Exception as e:
             logger.error(f"Page scraping error for {url}: {e}")
-            return 0
+            return [], None
+    
+    def initial_links(self):
+        """開始URLとサイトマップのURLを [URL, 優先度] のリストで返す（分散クロール用）"""
+        links = [[self.target.url, self.url_queue.score(self.target.url, 0)]]
+        if self.target.use_sitemap:
+            for url, lastmod, priority in self._discover_seed_urls():
+                links.append([url, self.url_queue.score(url, 1, sitemap_priority=priority, lastmod=lastmod)])
+        return links
+    
+    def crawl_page(self, url, depth, rate_limiter=None):
+        """単一ページを取得し、(アイテムのリスト, ページ, 次の深度のリンク) を返す（分散クロール用）
+        
+        リンクは [URL, 優先度] のリスト。rate_limiterを指定した場合はクローラーのレート制限の代わりに使う。
+        取得に失敗した場合のページはNone。
+        """
+        self._prepare_domain(url)
+        (rate_limiter or self.rate_limiter).acquire(urlparse(url).netloc)
+        
+        scraped_items, page = self._scrape_page(url, depth)
+        links = [[link, priority] for link, _, priority in self.url_queue.items()]
+        self.url_queue.clear()
+        return scraped_items, page, links
     
     def crawl(self):
-        """クロール実行"""
+        """クロール実行（取得したアイテムを順次返すジェネレーター）"""
         logger.info(f"Starting crawl for {self.target.name}")
         logger.info(f"Max depth: {self.max_depth}, Max pages: {self.max_pages}")
         
-        # 開始URLをキューに追加
-        self.url_queue.append((self.target.url, 0))
+        # 開始URLをキューに追加（再開時は保存されたキューから続行）
+        if not self.resumed:
+            self.url_queue.push(self.target.url, 0)
+            
+            # サイトマップのURLはナビゲーションを辿らずに直接キューに追加
+            if self.target.use_sitemap:
+                for url, lastmod, priority in self._discover_seed_urls():
+                    self.url_queue.push(url, 1, sitemap_priority=priority, lastmod=lastmod)
         
         while self.url_queue and self.pages_crawled < self.max_pages:
-            url, depth = self.url_queue.popleft()
+            url, depth = self.url_queue.pop()
             
-            if url in self.visited_urls:
+            # 訪問済みは正規化したURLで判定する（取得には元のURLを使う）
+            key = canonicalize_url(url)
+            if key in self.visited_urls:
                 continue
             
             logger.info(f"Crawling: {url} (depth: {depth})")
             
+            # レート制限（サーバーに負荷をかけないよう）
+            self._prepare_domain(url)
+            self.rate_limiter.acquire(urlparse(url).netloc)
+            
             # ページをスクレイピング
-            items_count = self._scrape_page(url, depth)
+            scraped_items, page = self._scrape_page(url, depth)
             
             # 訪問済みに追加
-            self.visited_urls.add(url)
+            self.visited_urls.add(key)
             self.pages_crawled += 1
+            self.items_scraped += len(scraped_items)
             
-            logger.info(f"Scraped {items_count} items from {url}")
+            logger.info(f"Scraped {len(scraped_items)} items from {url}")
             
-            # レート制限（サーバーに負荷をかけないよう）
-            time.sleep(1)
+            yield from scraped_items
+            
+            # ページの結果はアイテムが全て消費（保存）された後に通知する
+            if self.page_callback and page:
+                self.page_callback(url, depth, scraped_items, page.not_modified)
+            
+            self._checkpoint()
         
-        logger.info(f"Crawl completed. Pages: {self.pages_crawled}, Items: {len(self.scraped_data)}")
-        return self.scraped_data
\ No newline at end of file
+        logger.info(f"Crawl completed. Pages: {self.pages_crawled}, Items: {self.items_scraped}")
\ No newline at end of file
@@ -0,0 +1,70 @@
+from .redis_utils import get_redis
+from .url_utils import canonicalize_url
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 未訪問かつ最大ページ数に達していなければ訪問済みに登録する
+# KEYS[1]: 訪問済みURLのSET, KEYS[2]: 登録済みページ数
+# ARGV[1]: 最大ページ数, ARGV[2]: キーの有効期限（秒）, ARGV[3...]: URL
+# 戻り値: 新たに登録されたURLのリスト
+_CLAIM_SCRIPT = """
+local max_pages = tonumber(ARGV[1])
+local ttl = tonumber(ARGV[2])
+local pages = tonumber(redis.call('GET', KEYS[2]) or '0')
+local claimed = {}
+for i = 3, #ARGV do
+    if pages >= max_pages then
+        break
+    end
+    if redis.call('SADD', KEYS[1], ARGV[i]) == 1 then
+        pages = pages + 1
+        table.insert(claimed, ARGV[i])
+    end
+end
+redis.call('SET', KEYS[2], pages, 'EX', ttl)
+redis.call('EXPIRE', KEYS[1], ttl)
+return claimed
+"""
+
+
+class RedisCrawlFrontier:
+    """複数ワーカーで共有するクロール状態（訪問済みURL・ページ数）
+
+    ジョブ毎にRedisのキーを持ち、URLの登録は Lua スクリプトで原子的に行うため、
+    同じURLが複数のワーカーで取得されることはない。
+    訪問済みは正規化したURLで判定し、取得には元のURLを使う。
+    """
+
+    # クロールが異常終了した場合にキーが残り続けないよう有効期限を設定
+    KEY_TTL = 60 * 60 * 24
+
+    def __init__(self, job_id, max_pages):
+        self.job_id = job_id
+        self.max_pages = max_pages
+        self.visited_key = f'scraper:crawl:{job_id}:visited'
+        self.pages_key = f'scraper:crawl:{job_id}:pages'
+
+    def claim(self, urls):
+        """未訪問のURLを訪問済みに登録し、登録できたURLのリストを返す"""
+        # 同じリスト内の重複は先に除去（順序は維持）
+        keys = {}
+        for url in urls:
+            keys.setdefault(canonicalize_url(url), url)
+        if not keys:
+            return []
+
+        script = get_redis().register_script(_CLAIM_SCRIPT)
+        claimed = script(
+            keys=[self.visited_key, self.pages_key],
+            args=[self.max_pages, self.KEY_TTL, *keys]
+        )
+        return [keys[key.decode('utf-8')] for key in claimed]
+
+    def pages_claimed(self):
+        """登録済みのページ数"""
+        return int(get_redis().get(self.pages_key) or 0)
+
+    def clear(self):
+        """クロール状態を削除"""
+        get_redis().delete(self.visited_key, self.pages_key)
@@ -0,0 +1,191 @@
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from .models import ScrapedData, ScrapingJob
+import csv
+import datetime
+import io
+import json
+
+EXPORT_FORMATS = {
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'jsonl': ('application/x-ndjson', 'jsonl'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+}
+
+# 出力する列（values_list のフィールド名, 出力時の列名）
+EXPORT_COLUMNS = [
+    ('id', 'id'),
+    ('target_id', 'target_id'),
+    ('target__name', 'target'),
+    ('title', 'title'),
+    ('content', 'content'),
+    ('url', 'url'),
+    ('depth', 'depth'),
+    ('scraped_at', 'scraped_at'),
+    ('last_seen_at', 'last_seen_at'),
+]
+
+
+def _parse_boundary(value, end=False):
+    """日付（YYYY-MM-DD）または日時を日時に変換（日付のみの終了日はその日の終わりまで含める）"""
+    if not value:
+        return None
+    moment = parse_datetime(value)
+    if moment is None:
+        date = parse_date(value)
+        if date is None:
+            raise ValueError(f'Invalid date: {value}')
+        if end:
+            date += datetime.timedelta(days=1)
+        moment = datetime.datetime.combine(date, datetime.time())
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def export_queryset(target_id=None, job_id=None, since=None, until=None):
+    """エクスポート対象のスクレイピングデータ
+
+    job_idを指定した場合は、そのジョブの実行中に新しく取得されたデータを対象にする。
+    since・untilは取得日時の範囲（文字列の場合は日付または日時として解析）。
+    """
+    data = ScrapedData.objects.all()
+
+    if target_id:
+        data = data.filter(target_id=target_id)
+
+    if job_id:
+        job = ScrapingJob.objects.get(id=job_id)
+        data = data.filter(target_id=job.target_id)
+        if job.started_at:
+            data = data.filter(scraped_at__gte=job.started_at)
+        if job.completed_at:
+            data = data.filter(scraped_at__lte=job.completed_at)
+
+    since = _parse_boundary(since) if isinstance(since, str) else since
+    until = _parse_boundary(until, end=True) if isinstance(until, str) else until
+    if since:
+        data = data.filter(scraped_at__gte=since)
+    if until:
+        data = data.filter(scraped_at__lt=until)
+
+    # 主キー順に読み出す（サーバーサイドカーソルで少しずつ取得する）
+    return data.order_by('id').values_list(*[field for field, _ in EXPORT_COLUMNS])
+
+
+def _chunked(rows, chunk_size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def iter_csv(queryset, chunk_size):
+    """CSV（UTF-8、BOM付きでExcelでも文字化けしない）を少しずつ返す"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write('\ufeff')
+    writer.writerow([name for _, name in EXPORT_COLUMNS])
+
+    for chunk in _chunked(queryset.iterator(chunk_size=chunk_size), chunk_size):
+        for row in chunk:
+            writer.writerow([value.isoformat() if isinstance(value, datetime.datetime) else value for value in row])
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+def iter_jsonl(queryset, chunk_size):
+    """JSON Lines（1行1件）を少しずつ返す"""
+    names = [name for _, name in EXPORT_COLUMNS]
+    for chunk in _chunked(queryset.iterator(chunk_size=chunk_size), chunk_size):
+        lines = [
+            json.dumps(dict(zip(names, row)), ensure_ascii=False, default=_json_default)
+            for row in chunk
+        ]
+        yield ('\n'.join(lines) + '\n').encode('utf-8')
+
+
+def _json_default(value):
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+class _StreamBuffer(io.RawIOBase):
+    """書き込まれたバイト列を溜め、取り出すと空にする出力先（Parquetの逐次出力用）"""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def iter_parquet(queryset, chunk_size):
+    """Parquetをchunk_size件毎の行グループとして少しずつ返す（pyarrowが必要）"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ('id', pa.int64()),
+        ('target_id', pa.int64()),
+        ('target', pa.string()),
+        ('title', pa.string()),
+        ('content', pa.string()),
+        ('url', pa.string()),
+        ('depth', pa.int32()),
+        ('scraped_at', pa.timestamp('us', tz='UTC')),
+        ('last_seen_at', pa.timestamp('us', tz='UTC')),
+    ])
+    sink = _StreamBuffer()
+    writer = pq.ParquetWriter(sink, schema, compression=getattr(settings, 'SCRAPER_EXPORT_PARQUET_COMPRESSION', 'zstd'))
+
+    try:
+        for chunk in _chunked(queryset.iterator(chunk_size=chunk_size), chunk_size):
+            columns = list(zip(*chunk))
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(column, type=field.type) for column, field in zip(columns, schema)],
+                schema=schema
+            ))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def iter_export(queryset, export_format, chunk_size=None):
+    """指定した形式でエクスポートするバイト列のジェネレーター"""
+    chunk_size = chunk_size or getattr(settings, 'SCRAPER_EXPORT_CHUNK_SIZE', 2000)
+    if export_format == 'csv':
+        return iter_csv(queryset, chunk_size)
+    if export_format == 'jsonl':
+        return iter_jsonl(queryset, chunk_size)
+    if export_format == 'parquet':
+        # 出力を始める前に依存パッケージを確認する
+        import pyarrow.parquet  # noqa: F401
+        return iter_parquet(queryset, chunk_size)
+    raise ValueError(f'Unsupported export format: {export_format}')
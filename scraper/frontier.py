@@ -0,0 +1,131 @@
+from django.conf import settings
+from django.utils import timezone
+from django.utils.module_loading import import_string
+import heapq
+import itertools
+import re
+
+
+class DepthScorer:
+    """浅いページを優先"""
+
+    def __init__(self, target):
+        self.weight = getattr(settings, 'SCRAPER_FRONTIER_DEPTH_WEIGHT', 1.0)
+
+    def __call__(self, url, depth, context):
+        return -depth * self.weight
+
+
+class PatternScorer:
+    """優先パターンに一致するURLを先に、後回しパターンに一致するURLを後に"""
+
+    def __init__(self, target):
+        self.boost = getattr(settings, 'SCRAPER_FRONTIER_PATTERN_BOOST', 5.0)
+        self.priority_patterns = self._compile(target.priority_patterns)
+        self.deprioritize_patterns = self._compile(target.deprioritize_patterns)
+
+    def _compile(self, patterns):
+        return [re.compile(p.strip()) for p in patterns.split('\n') if p.strip()]
+
+    def __call__(self, url, depth, context):
+        score = 0.0
+        if any(pattern.search(url) for pattern in self.priority_patterns):
+            score += self.boost
+        if any(pattern.search(url) for pattern in self.deprioritize_patterns):
+            score -= self.boost
+        return score
+
+
+class ParentYieldScorer:
+    """アイテムが取得できたページからのリンクを優先"""
+
+    def __init__(self, target):
+        self.weight = getattr(settings, 'SCRAPER_FRONTIER_PARENT_YIELD_WEIGHT', 2.0)
+
+    def __call__(self, url, depth, context):
+        return self.weight if context.get('parent_items') else 0.0
+
+
+class SitemapPriorityScorer:
+    """サイトマップのpriority（0.0〜1.0）を反映"""
+
+    def __init__(self, target):
+        self.weight = getattr(settings, 'SCRAPER_FRONTIER_SITEMAP_WEIGHT', 2.0)
+
+    def __call__(self, url, depth, context):
+        priority = context.get('sitemap_priority')
+        return priority * self.weight if priority is not None else 0.0
+
+
+class LastmodScorer:
+    """サイトマップのlastmodが新しいページを優先"""
+
+    def __init__(self, target):
+        self.weight = getattr(settings, 'SCRAPER_FRONTIER_LASTMOD_WEIGHT', 1.0)
+        self.days = getattr(settings, 'SCRAPER_FRONTIER_LASTMOD_DAYS', 30)
+
+    def __call__(self, url, depth, context):
+        lastmod = context.get('lastmod')
+        if lastmod is None:
+            return 0.0
+        age_days = (timezone.now() - lastmod).total_seconds() / 86400
+        return self.weight * max(0.0, 1.0 - age_days / self.days)
+
+
+DEFAULT_SCORERS = [
+    'scraper.frontier.DepthScorer',
+    'scraper.frontier.PatternScorer',
+    'scraper.frontier.ParentYieldScorer',
+    'scraper.frontier.SitemapPriorityScorer',
+    'scraper.frontier.LastmodScorer',
+]
+
+
+def build_scorers(target):
+    """SCRAPER_FRONTIER_SCORERS に指定されたスコア計算クラスを対象サイト用に作成"""
+    paths = getattr(settings, 'SCRAPER_FRONTIER_SCORERS', DEFAULT_SCORERS)
+    return [import_string(path)(target) for path in paths]
+
+
+class CrawlFrontier:
+    """優先度付きの未訪問キュー
+
+    スコアが高いURLから取り出す。同じスコアの場合は追加した順（幅優先）。
+    """
+
+    def __init__(self, scorers=()):
+        self.scorers = list(scorers)
+        self._heap = []
+        self._counter = itertools.count()
+
+    def score(self, url, depth, **context):
+        """URLの優先度を計算"""
+        return sum(scorer(url, depth, context) for scorer in self.scorers)
+
+    def push(self, url, depth, priority=None, **context):
+        """URLを追加（priorityを省略した場合はスコアを計算）"""
+        if priority is None:
+            priority = self.score(url, depth, **context)
+        heapq.heappush(self._heap, (-priority, next(self._counter), url, depth))
+
+    def pop(self):
+        """最も優先度が高いURLと深度を取り出す"""
+        _, _, url, depth = heapq.heappop(self._heap)
+        return url, depth
+
+    def items(self):
+        """(URL, 深度, 優先度) を優先度順に返す（保存用）"""
+        return [(url, depth, -priority) for priority, _, url, depth in sorted(self._heap)]
+
+    def clear(self):
+        self._heap = []
+
+    def __len__(self):
+        return len(self._heap)
+
+    def __bool__(self):
+        return bool(self._heap)
+
+    def __iter__(self):
+        """(URL, 深度) を優先度順に返す"""
+        return ((url, depth) for url, depth, _ in self.items())
@@ -0,0 +1,135 @@
+from django.conf import settings
+from django.utils import timezone
+from .models import HttpCacheEntry
+from collections import defaultdict
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class ResponseCache:
+    """条件付きGET（ETag / Last-Modified）用のレスポンスキャッシュ
+
+    対象サイト毎にURLの検証子と抽出したリンクを保存する。
+    304が返った場合は本文を解析せず、保存済みのリンクでクロールを継続する。
+    検証子はページのアイテムを保存するまでメモリ上に保持し、commit で保存する
+    （保存前にジョブが失敗した場合に、次回304が返ってアイテムを取りこぼさないようにする）。
+    セレクタが変更された場合は保存済みのエントリを使わない。
+    """
+
+    def __init__(self, target):
+        self.target = target
+        self.selector_hash = HttpCacheEntry.compute_selector_hash(target)
+        self._entries = {}
+        # 保存待ちの検証子とリンク（URL毎）
+        self._pending = {}
+
+    def _get_entry(self, url):
+        """キャッシュエントリを取得（同一クロール内ではメモリ上に保持）"""
+        if url not in self._entries:
+            self._entries[url] = HttpCacheEntry.objects.filter(
+                target=self.target, url=url, selector_hash=self.selector_hash
+            ).first()
+        return self._entries[url]
+
+    def conditional_headers(self, url):
+        """条件付きリクエスト用のヘッダーを返す"""
+        entry = self._get_entry(url)
+        headers = {}
+        if entry:
+            if entry.etag:
+                headers['If-None-Match'] = entry.etag
+            if entry.last_modified:
+                headers['If-Modified-Since'] = entry.last_modified
+        return headers
+
+    def mark_not_modified(self, url):
+        """304を受け取ったエントリの最終アクセス日時を更新"""
+        HttpCacheEntry.objects.filter(target=self.target, url=url).update(last_accessed_at=timezone.now())
+
+    def store(self, url, response_headers, content_length):
+        """200レスポンスの検証子を保存待ちにする（commit で保存）"""
+        etag = response_headers.get('ETag', '')
+        last_modified = response_headers.get('Last-Modified', '')
+
+        # 検証子のないレスポンスは条件付きGETができないため保存しない
+        if not etag and not last_modified:
+            self._pending.pop(url, None)
+            return
+
+        self._pending[url] = {
+            'etag': etag[:500],
+            'last_modified': last_modified[:100],
+            'content_length': content_length,
+            'links': [],
+        }
+
+    def commit(self, urls):
+        """アイテムを保存したページの検証子を保存"""
+        now = timezone.now()
+        for url in urls:
+            pending = self._pending.pop(url, None)
+            if pending is None:
+                continue
+            entry, _ = HttpCacheEntry.objects.update_or_create(
+                target=self.target,
+                url=url,
+                defaults={
+                    **pending,
+                    'selector_hash': self.selector_hash,
+                    'fetched_at': now,
+                    'last_accessed_at': now,
+                }
+            )
+            self._entries[url] = entry
+
+    def get_links(self, url):
+        """前回取得時に抽出したリンクを返す"""
+        entry = self._get_entry(url)
+        return entry.links if entry else []
+
+    def store_links(self, url, links):
+        """抽出したリンクを保存（保存待ちの場合は検証子と一緒に保存）"""
+        if url in self._pending:
+            self._pending[url]['links'] = links
+            return
+        entry = self._get_entry(url)
+        if entry and entry.links != links:
+            entry.links = links
+            entry.save(update_fields=['links'])
+
+
+def evict_cache_entries(max_entries=None):
+    """最終アクセスが古いエントリから削除し、件数を上限以下に保つ"""
+    if max_entries is None:
+        max_entries = getattr(settings, 'SCRAPER_HTTP_CACHE_MAX_ENTRIES', 100000)
+
+    cutoff = list(
+        HttpCacheEntry.objects.order_by('-last_accessed_at')
+        .values_list('last_accessed_at', flat=True)[max_entries:max_entries + 1]
+    )
+    if not cutoff:
+        return 0
+
+    deleted, _ = HttpCacheEntry.objects.filter(last_accessed_at__lte=cutoff[0]).delete()
+    logger.info(f"Evicted {deleted} HTTP cache entries")
+    return deleted
+
+
+def invalidate_cache_entries(pages, chunk_size=500):
+    """ページのエントリを削除し、次回は条件付きGETを使わずに取得させる
+
+    pagesは (対象サイトのID, 取得元ページのURL) の組。保存期間を過ぎたデータを削除したページが
+    304を返し続けてデータが再取得されなくなるのを防ぐ（他のページの検証子は残す）。
+    """
+    urls_by_target = defaultdict(set)
+    for target_id, url in pages:
+        urls_by_target[target_id].add(url)
+
+    deleted = 0
+    for target_id, urls in urls_by_target.items():
+        urls = list(urls)
+        for i in range(0, len(urls), chunk_size):
+            count, _ = HttpCacheEntry.objects.filter(target_id=target_id, url__in=urls[i:i + chunk_size]).delete()
+            deleted += count
+    return deleted
@@ -0,0 +1,104 @@
+from django.conf import settings
+from .redis_utils import get_redis
+import time
+import uuid
+
+# 対象サイトのロックを取得し、同時実行数の枠を確保する
+# KEYS[1]: ロックのキー, KEYS[2]: 実行中ジョブのSORTED SET（スコアは有効期限）
+# ARGV[1]: 所有者, ARGV[2]: 有効期限（ミリ秒）, ARGV[3]: 最大同時実行数（0で無制限）, ARGV[4]: 対象サイトID
+# 戻り値: 'ok' / 'locked'（同じ対象サイトが実行中） / 'busy'（同時実行数の上限）
+_ACQUIRE_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    return 'locked'
+end
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) * 1000 + math.floor(tonumber(now_parts[2]) / 1000)
+local ttl = tonumber(ARGV[2])
+local max_jobs = tonumber(ARGV[3])
+redis.call('ZREMRANGEBYSCORE', KEYS[2], '-inf', now)
+if max_jobs > 0 and redis.call('ZCARD', KEYS[2]) >= max_jobs then
+    return 'busy'
+end
+redis.call('SET', KEYS[1], ARGV[1], 'PX', ttl)
+redis.call('ZADD', KEYS[2], now + ttl, ARGV[4])
+return 'ok'
+"""
+
+# 所有者が一致する場合のみ有効期限を延長
+# ARGV[1]: 現在の所有者, ARGV[2]: 有効期限（ミリ秒）, ARGV[3]: 新しい所有者, ARGV[4]: 対象サイトID
+_REFRESH_SCRIPT = """
+if redis.call('GET', KEYS[1]) ~= ARGV[1] then
+    return 0
+end
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) * 1000 + math.floor(tonumber(now_parts[2]) / 1000)
+local ttl = tonumber(ARGV[2])
+redis.call('SET', KEYS[1], ARGV[3], 'PX', ttl)
+redis.call('ZADD', KEYS[2], now + ttl, ARGV[4])
+return 1
+"""
+
+# 所有者が一致する場合のみロックを解放
+_RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) ~= ARGV[1] then
+    return 0
+end
+redis.call('DEL', KEYS[1])
+redis.call('ZREM', KEYS[2], ARGV[2])
+return 1
+"""
+
+
+class TargetLock:
+    """対象サイト毎の実行ロック（全ワーカーで共有）
+
+    同じ対象サイトのジョブが重複して実行されないようにし、
+    同時に実行できるジョブの数を SCRAPER_MAX_CONCURRENT_JOBS に制限する。
+    ワーカーが異常終了してもロックが残らないよう有効期限を設定し、実行中は定期的に延長する。
+    所有者にはジョブIDを使い、分散クロールでは各タスクから延長・解放できるようにする。
+    """
+
+    RUNNING_JOBS_KEY = 'scraper:running_jobs'
+
+    def __init__(self, target_id, owner=None):
+        self.target_id = str(target_id)
+        self.key = f'scraper:lock:target:{target_id}'
+        self.owner = str(owner) if owner is not None else uuid.uuid4().hex
+        self.ttl = getattr(settings, 'SCRAPER_TARGET_LOCK_TTL', 600)
+        self._refreshed_at = 0
+
+    def _run(self, script, args):
+        return get_redis().register_script(script)(keys=[self.key, self.RUNNING_JOBS_KEY], args=args)
+
+    def acquire(self):
+        """ロックを取得し、'ok' / 'locked' / 'busy' を返す"""
+        result = self._run(_ACQUIRE_SCRIPT, [
+            self.owner,
+            int(self.ttl * 1000),
+            getattr(settings, 'SCRAPER_MAX_CONCURRENT_JOBS', 4),
+            self.target_id,
+        ])
+        if result == b'ok':
+            self._refreshed_at = time.monotonic()
+        return result.decode('utf-8')
+
+    def bind(self, job_id):
+        """所有者をジョブIDに変更（ジョブ作成前に取得したロックをジョブに引き継ぐ）"""
+        owner = str(job_id)
+        if self._run(_REFRESH_SCRIPT, [self.owner, int(self.ttl * 1000), owner, self.target_id]):
+            self.owner = owner
+            return True
+        return False
+
+    def refresh(self, force=False):
+        """有効期限を延長（頻繁に呼ばれても有効期限の1/3が経過するまでは何もしない）"""
+        if not force and time.monotonic() - self._refreshed_at < self.ttl / 3:
+            return True
+        self._refreshed_at = time.monotonic()
+        return bool(self._run(_REFRESH_SCRIPT, [self.owner, int(self.ttl * 1000), self.owner, self.target_id]))
+
+    def release(self):
+        return bool(self._run(_RELEASE_SCRIPT, [self.owner, self.target_id]))
+
+    def is_locked(self):
+        return bool(get_redis().exists(self.key))
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand, CommandError
+from scraper.export import EXPORT_FORMATS, export_queryset, iter_export
+from scraper.models import ScrapingJob
+import sys
+
+
+class Command(BaseCommand):
+    help = 'スクレイピングデータをCSV / JSONL / Parquetでエクスポートします'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=list(EXPORT_FORMATS), default='csv', help='出力形式')
+        parser.add_argument('--target', type=int, help='対象サイトID')
+        parser.add_argument('--job', type=int, help='ジョブID（ジョブの実行中に新しく取得されたデータ）')
+        parser.add_argument('--since', help='取得日時の開始（YYYY-MM-DD または ISO 8601）')
+        parser.add_argument('--until', help='取得日時の終了（YYYY-MM-DD の場合はその日を含む）')
+        parser.add_argument('--chunk-size', type=int, help='1回に読み出す件数（既定: SCRAPER_EXPORT_CHUNK_SIZE）')
+        parser.add_argument('-o', '--output', help='出力先のファイル（省略時は標準出力）')
+
+    def handle(self, *args, **options):
+        try:
+            queryset = export_queryset(
+                target_id=options['target'],
+                job_id=options['job'],
+                since=options['since'],
+                until=options['until'],
+            )
+            stream = iter_export(queryset, options['format'], options['chunk_size'])
+        except ScrapingJob.DoesNotExist:
+            raise CommandError(f"Job {options['job']} not found")
+        except ImportError:
+            raise CommandError('Parquet export requires pyarrow')
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        output = open(options['output'], 'wb') if options['output'] else sys.stdout.buffer
+        try:
+            size = 0
+            for chunk in stream:
+                output.write(chunk)
+                size += len(chunk)
+        finally:
+            if options['output']:
+                output.close()
+
+        if options['output']:
+            self.stderr.write(self.style.SUCCESS(f"{options['output']} に出力しました（{size} バイト）"))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+from scraper.partitions import create_partitions, is_partitioned, list_partitions, partition_scraped_data
+
+
+class Command(BaseCommand):
+    help = 'スクレイピングデータのテーブルを最終確認日時による範囲パーティションに変換します（PostgreSQL）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default', help='対象のデータベース')
+
+    def handle(self, *args, **options):
+        using = options['database']
+        if is_partitioned(using):
+            created = create_partitions(using)
+            self.stdout.write(f'パーティション化済みです（{created} 個のパーティションを作成しました）')
+        else:
+            try:
+                count = partition_scraped_data(using)
+            except ValueError as e:
+                raise CommandError(str(e))
+            self.stdout.write(self.style.SUCCESS(f'{count} 件のデータをパーティションに移行しました'))
+
+        for name in list_partitions(using):
+            self.stdout.write(f'  {name}')
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from scraper.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = '全文検索用のインデックスとトリガーを作成し、既存データを索引付けします'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default', help='対象のデータベース')
+        parser.add_argument('--batch-size', type=int, default=10000, help='1回の更新で索引付けする件数（PostgreSQL）')
+
+    def handle(self, *args, **options):
+        count = rebuild_search_index(options['database'], options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'{count} 件のデータを索引付けしました'))
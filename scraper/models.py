@@ -1,9 +1,28 @@
+import hashlib
+from datetime import timedelta
+from django.conf import settings
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 from django.utils import timezone
+from .parsers import PARSER_CHOICES
+from .render_profiles import RENDER_PROFILE_CHOICES
 
 
 class ScrapingTarget(models.Model):
     """スクレイピング対象サイトの設定"""
+    SCRAPING_METHOD_CHOICES = [
+        ('auto', '自動判定'),
+        ('requests', 'requests（静的HTML）'),
+        ('selenium', 'Selenium（JavaScript描画）'),
+    ]
+    
+    WAIT_STRATEGY_CHOICES = [
+        ('load', '読み込み完了'),
+        ('selector', 'セレクタの出現'),
+        ('network_idle', '通信の完了'),
+        ('dom_idle', 'DOM変更の停止'),
+    ]
+    
     name = models.CharField('サイト名', max_length=200)
     url = models.URLField('URL')
     css_selector = models.TextField('CSSセレクタ', help_text='取得したいデータのCSSセレクタ')
@@ -16,6 +35,32 @@ class ScrapingTarget(models.Model):
     link_selector = models.TextField('リンクセレクタ', default='a[href]', help_text='クロール対象のリンクを指定するCSSセレクタ')
     allowed_domains = models.TextField('許可ドメイン', blank=True, help_text='クロール対象ドメイン（空白の場合は同一ドメインのみ）')
     exclude_patterns = models.TextField('除外パターン', blank=True, help_text='除外するURLパターン（改行区切り）')
+    priority_patterns = models.TextField('優先パターン', blank=True, help_text='先にクロールするURLパターン（改行区切り、正規表現）')
+    deprioritize_patterns = models.TextField('後回しパターン', blank=True, help_text='後にクロールするURLパターン（改行区切り、正規表現）')
+    use_sitemap = models.BooleanField('サイトマップ', default=False, help_text='有効にするとサイトマップに記載されたURLを最初にキューに追加します')
+    respect_robots_txt = models.BooleanField('robots.txtを遵守', default=True, help_text='Disallowに一致するURLを除外し、Crawl-delayをレート制限に反映します')
+    
+    # パフォーマンス設定
+    async_crawl = models.BooleanField('非同期クロール', default=False, help_text='有効にすると複数ページを並列で取得します（Selenium使用時は無効）')
+    distributed_crawl = models.BooleanField('分散クロール', default=False, help_text='有効にするとページ毎にタスクを分割し、複数のワーカーでクロールします')
+    concurrency = models.IntegerField('同時接続数', default=8, help_text='非同期クロール時のワーカー数')
+    per_domain_concurrency = models.IntegerField('ドメイン毎の同時接続数', default=2, help_text='同一ドメインへの最大同時リクエスト数')
+    rate_limit = models.FloatField('レート制限', default=1.0, help_text='ドメイン毎の1秒あたりの最大リクエスト数（0で無制限）')
+    rate_limit_burst = models.IntegerField('バースト数', default=1, help_text='レート制限内で連続して送信できるリクエスト数')
+    auto_throttle = models.BooleanField('自動スロットリング', default=True, help_text='応答時間や429/503に応じてリクエスト間隔と同時接続数を自動で調整します（レート制限が上限）')
+    use_http_cache = models.BooleanField('条件付きGET', default=True, help_text='ETag/Last-Modifiedで変更がないページは解析・保存をスキップします（requests使用時のみ）')
+    html_parser = models.CharField('HTMLパーサー', max_length=20, choices=PARSER_CHOICES, blank=True, help_text='空白の場合はシステム設定（SCRAPER_HTML_PARSER）を使用')
+    
+    # JavaScript描画設定（Selenium使用時のみ）
+    scraping_method = models.CharField('取得方法', max_length=20, choices=SCRAPING_METHOD_CHOICES, default='auto', help_text='自動判定の場合はドメイン毎に判定結果をキャッシュします')
+    wait_strategy = models.CharField('待機方法', max_length=20, choices=WAIT_STRATEGY_CHOICES, default='dom_idle', help_text='ページの描画完了を判定する方法')
+    wait_selector = models.CharField('待機セレクタ', max_length=500, blank=True, help_text='出現を待つCSSセレクタ（空白の場合はCSSセレクタを使用）')
+    wait_timeout = models.FloatField('最大待機時間', default=10.0, help_text='描画完了を待つ最大秒数（超えた場合はその時点の内容を取得）')
+    render_profile = models.CharField('レンダリングプロファイル', max_length=20, choices=RENDER_PROFILE_CHOICES, default='light', help_text='ページ表示時に読み込まないリソース')
+    blocked_url_patterns = models.TextField('ブロックするURL', blank=True, help_text='読み込まないURLのパターン（改行区切り、*でワイルドカード）')
+    
+    # 統計（ダッシュボードでテーブル全体を数えないよう保存時に更新）
+    items_count = models.IntegerField('データ件数', default=0, editable=False, help_text='保存されているスクレイピングデータの件数')
     
     created_at = models.DateTimeField('作成日時', auto_now_add=True)
     updated_at = models.DateTimeField('更新日時', auto_now=True)
@@ -34,16 +79,43 @@ class ScrapedData(models.Model):
     title = models.CharField('タイトル', max_length=2000, blank=True)
     content = models.TextField('内容')
     url = models.URLField('URL', max_length=500, blank=True)
+    page_url = models.URLField('取得元ページ', max_length=500, blank=True, help_text='データを抽出したページのURL（単一ページモードではURLと異なる）')
     depth = models.IntegerField('クロール深度', default=0, help_text='0=開始ページ、1=1階層下、など')
     scraped_at = models.DateTimeField('取得日時', default=timezone.now)
+    last_seen_at = models.DateTimeField('最終確認日時', default=timezone.now, help_text='同じ内容が最後に取得された日時')
+    fingerprint = models.CharField('フィンガープリント', max_length=64, null=True, editable=False, help_text='対象サイト・URL・タイトル・内容のハッシュ')
+    search_vector = SearchVectorField('検索用ベクトル', null=True, editable=False, help_text='全文検索用（PostgreSQLのトリガーで更新）')
     
     class Meta:
         verbose_name = 'スクレイピングデータ'
         verbose_name_plural = 'スクレイピングデータ'
-        ordering = ['-scraped_at']
+        ordering = ['-scraped_at', '-id']
+        indexes = [
+            # 一覧のキーセットページネーション用（全件・対象サイト毎）
+            models.Index(fields=['-scraped_at', '-id'], name='scraper_data_scraped_at_idx'),
+            models.Index(fields=['target', '-scraped_at', '-id'], name='scraper_data_target_idx'),
+            # 変更がなかったページのデータの最終確認日時の更新用
+            models.Index(fields=['target', 'page_url'], name='scraper_data_page_url_idx'),
+            # 重複判定用（パーティション化したテーブルには一意制約を作成できないため、
+            # 重複は対象サイト毎に保存を直列化して防ぐ）
+            models.Index(fields=['fingerprint'], name='scraper_data_fingerprint_idx'),
+            # 保存期間を過ぎたデータの削除用（パーティション化していない場合）
+            models.Index(fields=['last_seen_at'], name='scraper_data_last_seen_idx'),
+        ]
 
     def __str__(self):
         return f"{self.target.name} - {self.title or '無題'}"
+    
+    @property
+    def source_url(self):
+        """取得元ページのURL（取得元を記録する前のデータはURLを使う）"""
+        return self.page_url or self.url
+    
+    @staticmethod
+    def compute_fingerprint(target_id, url, title, content):
+        """重複判定用のフィンガープリントを計算"""
+        source = '\x1f'.join([str(target_id), url, title, content])
+        return hashlib.sha256(source.encode('utf-8')).hexdigest()
 
 
 class ScrapingJob(models.Model):
@@ -66,6 +138,135 @@ class ScrapingJob(models.Model):
         verbose_name = 'スクレイピングジョブ'
         verbose_name_plural = 'スクレイピングジョブ'
         ordering = ['-started_at']
+        indexes = [
+            # 実行中ジョブの集計と古いジョブの削除用
+            models.Index(fields=['status'], name='scraper_job_status_idx'),
+            models.Index(fields=['started_at'], name='scraper_job_started_at_idx'),
+        ]
 
     def __str__(self):
-        return f"{self.target.name} - {self.get_status_display()}" 
\ No newline at end of file
+        return f"{self.target.name} - {self.get_status_display()}"
+    
+    @property
+    def is_resumable(self):
+        """チェックポイントから再開できるか
+        
+        失敗したジョブ、または実行中のままチェックポイントが一定時間更新されていない
+        （ワーカーの再起動等で中断された）ジョブが対象。
+        """
+        checkpoint = getattr(self, 'crawlcheckpoint', None)
+        if checkpoint is None:
+            return False
+        if self.status == 'failed':
+            return True
+        if self.status == 'running':
+            stale_seconds = getattr(settings, 'SCRAPER_CHECKPOINT_STALE_SECONDS', 600)
+            return checkpoint.updated_at < timezone.now() - timedelta(seconds=stale_seconds)
+        return False
+
+
+class CrawlCheckpoint(models.Model):
+    """クロールの再開用チェックポイント"""
+    job = models.OneToOneField(ScrapingJob, on_delete=models.CASCADE, verbose_name='ジョブ')
+    frontier = models.JSONField('未訪問キュー', default=list, help_text='[URL, 深度, 優先度] のリスト')
+    visited_urls = models.JSONField('訪問済みURL', default=list, help_text='URLのリスト（大規模クロールではBloomフィルター）')
+    pages_crawled = models.IntegerField('クロール済みページ数', default=0)
+    updated_at = models.DateTimeField('更新日時', auto_now=True)
+    
+    class Meta:
+        verbose_name = 'クロールチェックポイント'
+        verbose_name_plural = 'クロールチェックポイント'
+
+    def __str__(self):
+        return f"{self.job} - {self.pages_crawled}ページ"
+    
+    def get_state(self):
+        """クローラーに渡す状態を返す"""
+        return {
+            'frontier': self.frontier,
+            'visited_urls': self.visited_urls,
+            'pages_crawled': self.pages_crawled,
+        }
+
+
+class HttpCacheEntry(models.Model):
+    """条件付きGET用のレスポンスキャッシュ"""
+    target = models.ForeignKey(ScrapingTarget, on_delete=models.CASCADE, verbose_name='対象サイト')
+    url = models.URLField('URL', max_length=500)
+    etag = models.CharField('ETag', max_length=500, blank=True)
+    last_modified = models.CharField('Last-Modified', max_length=100, blank=True)
+    links = models.JSONField('抽出リンク', default=list, blank=True)
+    content_length = models.IntegerField('サイズ', default=0)
+    fetched_at = models.DateTimeField('取得日時', default=timezone.now)
+    last_accessed_at = models.DateTimeField('最終アクセス日時', default=timezone.now, db_index=True)
+    selector_hash = models.CharField('セレクタのハッシュ', max_length=64, blank=True, help_text='保存時のCSSセレクタ・リンクセレクタのハッシュ（変更された場合は使用しない）')
+    
+    class Meta:
+        verbose_name = 'HTTPキャッシュ'
+        verbose_name_plural = 'HTTPキャッシュ'
+        unique_together = [('target', 'url')]
+
+    def __str__(self):
+        return f"{self.target.name} - {self.url}"
+    
+    @staticmethod
+    def compute_selector_hash(target):
+        """抽出結果に影響するセレクタのハッシュを計算"""
+        source = '\x1f'.join([target.css_selector, target.link_selector])
+        return hashlib.sha256(source.encode('utf-8')).hexdigest()
+
+
+class PageState(models.Model):
+    """ページ毎の更新頻度と次回訪問日時（差分再クロール用）"""
+    target = models.ForeignKey(ScrapingTarget, on_delete=models.CASCADE, verbose_name='対象サイト')
+    url = models.URLField('URL', max_length=500)
+    depth = models.IntegerField('クロール深度', default=0)
+    content_hash = models.CharField('内容のハッシュ', max_length=64, blank=True, help_text='前回取得したアイテムのハッシュ')
+    check_count = models.IntegerField('確認回数', default=0)
+    change_count = models.IntegerField('変更回数', default=0)
+    last_crawled_at = models.DateTimeField('最終取得日時', null=True, blank=True)
+    last_changed_at = models.DateTimeField('最終変更日時', null=True, blank=True)
+    recrawl_interval = models.FloatField('再訪問間隔', default=0, help_text='秒')
+    next_crawl_at = models.DateTimeField('次回訪問日時', default=timezone.now, db_index=True)
+    
+    class Meta:
+        verbose_name = 'ページ状態'
+        verbose_name_plural = 'ページ状態'
+        unique_together = [('target', 'url')]
+
+    def __str__(self):
+        return f"{self.target.name} - {self.url}"
+    
+    @staticmethod
+    def compute_content_hash(items):
+        """ページから取得したアイテムのハッシュを計算"""
+        source = '\x1e'.join(f"{item['title']}\x1f{item['content']}" for item in items)
+        return hashlib.sha256(source.encode('utf-8')).hexdigest()
+    
+    def record_visit(self, content_hash, now):
+        """取得結果を記録し、変更の有無に応じて次回訪問日時を調整
+        
+        内容が変わっていれば間隔を縮め、変わっていなければ広げる。
+        content_hashがNoneの場合（304 Not Modified）は変更なしとして扱う。
+        """
+        min_interval = getattr(settings, 'SCRAPER_RECRAWL_MIN_INTERVAL', 60 * 15)
+        max_interval = getattr(settings, 'SCRAPER_RECRAWL_MAX_INTERVAL', 60 * 60 * 24 * 30)
+        
+        if not self.content_hash:
+            # 初回は初期間隔から始める
+            interval = getattr(settings, 'SCRAPER_RECRAWL_INITIAL_INTERVAL', 60 * 60 * 24)
+        elif content_hash is not None and content_hash != self.content_hash:
+            interval = self.recrawl_interval * getattr(settings, 'SCRAPER_RECRAWL_SPEEDUP_FACTOR', 0.5)
+            self.change_count += 1
+            self.last_changed_at = now
+        else:
+            interval = self.recrawl_interval * getattr(settings, 'SCRAPER_RECRAWL_BACKOFF_FACTOR', 1.5)
+        
+        if content_hash is not None:
+            self.content_hash = content_hash
+        if self.last_changed_at is None:
+            self.last_changed_at = now
+        self.check_count += 1
+        self.last_crawled_at = now
+        self.recrawl_interval = min(max(interval, min_interval), max_interval)
+        self.next_crawl_at = now + timedelta(seconds=self.recrawl_interval)
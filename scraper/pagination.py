@@ -0,0 +1,149 @@
+from django.core.exceptions import ValidationError
+from django.db import connections
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+import base64
+import datetime
+import json
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(values):
+    """ソートキーの値をURLに埋め込む文字列に変換"""
+    values = [value.isoformat() if isinstance(value, datetime.datetime) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(values).encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, UnicodeError):
+        raise InvalidCursor(cursor)
+    if not isinstance(values, list):
+        raise InvalidCursor(cursor)
+    return values
+
+
+def _parse_value(value):
+    if isinstance(value, str):
+        try:
+            return parse_datetime(value) or value
+        except ValueError:
+            raise InvalidCursor(value)
+    return value
+
+
+def estimate_count(queryset):
+    """件数の概算（PostgreSQLでは実行計画の推定行数を使い、テーブルを数えない）"""
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return queryset.count()
+
+    sql, params = queryset.order_by().values('pk').query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class CursorPage:
+    """カーソル方式のページ（テンプレートからは Paginator のページと同様に反復できる）"""
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.has_next = has_next
+        self.has_previous = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+    @property
+    def next_cursor(self):
+        return self.paginator.cursor_for(self.object_list[-1]) if self.has_next else None
+
+    @property
+    def previous_cursor(self):
+        return self.paginator.cursor_for(self.object_list[0]) if self.has_previous else None
+
+
+class CursorPaginator:
+    """キーセット（カーソル）方式のページネーション
+
+    OFFSETを使わず、前のページの最後の行のソートキーより後ろの行を取得するため、
+    何ページ目でもインデックスを辿る範囲は同じになる。
+    orderingは一意になるよう主キーを最後に含める（例: ('-scraped_at', '-id')）。
+    ソートキーにNULLを含む列は使えない。
+    """
+
+    def __init__(self, queryset, per_page, ordering=('-id',)):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.fields = [(field.lstrip('-'), field.startswith('-')) for field in ordering]
+        self.ordering = list(ordering)
+
+    def cursor_for(self, obj):
+        return encode_cursor([getattr(obj, name) for name, _ in self.fields])
+
+    def _filter(self, values, forward):
+        """カーソルの位置より後ろ（forward=False の場合は前）の行に絞り込む条件"""
+        if len(values) != len(self.fields):
+            raise InvalidCursor(values)
+        values = [_parse_value(value) for value in values]
+
+        # (a, b) < (x, y) を a < x OR (a = x AND b < y) に展開する
+        condition = Q()
+        for i, (name, descending) in enumerate(self.fields):
+            lookup = 'lt' if descending == forward else 'gt'
+            term = Q(**{f'{name}__{lookup}': values[i]})
+            for (previous_name, _), previous_value in zip(self.fields[:i], values):
+                term &= Q(**{previous_name: previous_value})
+            condition |= term
+        return condition
+
+    def get_page(self, after=None, before=None):
+        """afterの次のページ、またはbeforeの前のページを取得（どちらもない場合は最初のページ）
+
+        不正なカーソルの場合は最初のページを返す。
+        """
+        try:
+            if before:
+                values = decode_cursor(before)
+                reversed_ordering = [field[1:] if field.startswith('-') else f'-{field}' for field in self.ordering]
+                rows = list(
+                    self.queryset.filter(self._filter(values, forward=False))
+                    .order_by(*reversed_ordering)[:self.per_page + 1]
+                )
+                has_previous = len(rows) > self.per_page
+                rows = rows[:self.per_page]
+                rows.reverse()
+                return CursorPage(rows, self, has_next=True, has_previous=has_previous)
+
+            queryset = self.queryset
+            if after:
+                queryset = queryset.filter(self._filter(decode_cursor(after), forward=True))
+        except (ValueError, TypeError, ValidationError):
+            # 改ざんされたカーソル（InvalidCursorを含む）
+            return self.get_page()
+
+        rows = list(queryset.order_by(*self.ordering)[:self.per_page + 1])
+        has_next = len(rows) > self.per_page
+        return CursorPage(rows[:self.per_page], self, has_next=has_next, has_previous=bool(after))
+
+    def estimated_count(self):
+        return estimate_count(self.queryset)
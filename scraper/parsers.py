@@ -0,0 +1,113 @@
+from bs4 import BeautifulSoup, UnicodeDammit
+from django.conf import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class ParserBackend:
+    """HTML解析バックエンドの基底クラス"""
+    name = None
+
+    def parse(self, content):
+        """HTML（bytesまたはstr）を解析してドキュメントを返す"""
+        raise NotImplementedError
+
+    def select(self, document, css_selector):
+        """CSSセレクタに一致する要素のリストを返す"""
+        raise NotImplementedError
+
+    def get_text(self, element):
+        """要素のテキストを取得（前後の空白を除去して連結）"""
+        raise NotImplementedError
+
+    def get_attribute(self, element, name, default=''):
+        """要素の属性値を取得"""
+        raise NotImplementedError
+
+
+class BeautifulSoupBackend(ParserBackend):
+    """BeautifulSoupを使ったバックエンド（html.parser / lxml）"""
+
+    def __init__(self, features):
+        self.name = features
+        self.features = features
+
+    def parse(self, content):
+        return BeautifulSoup(content, self.features)
+
+    def select(self, document, css_selector):
+        return document.select(css_selector)
+
+    def get_text(self, element):
+        return element.get_text(strip=True)
+
+    def get_attribute(self, element, name, default=''):
+        return element.get(name, default)
+
+
+class SelectolaxBackend(ParserBackend):
+    """selectolax（Lexbor）を使った高速バックエンド"""
+    name = 'selectolax'
+
+    def __init__(self):
+        from selectolax.lexbor import LexborHTMLParser
+        self.parser_class = LexborHTMLParser
+
+    def parse(self, content):
+        # Lexborは文字コードを判定しないため、meta等から判定してデコードしておく
+        if isinstance(content, bytes):
+            content = UnicodeDammit(content, is_html=True).unicode_markup
+        return self.parser_class(content)
+
+    def select(self, document, css_selector):
+        elements = document.css(css_selector)
+        if ',' not in css_selector:
+            return elements
+
+        # セレクタリストの場合、Lexborはグループ毎の順序で重複を含めて返すため、
+        # BeautifulSoupと同じ文書順・重複なしの結果に揃える
+        order = {node.mem_id: i for i, node in enumerate(document.root.traverse())}
+        unique = {node.mem_id: node for node in elements}
+        return sorted(unique.values(), key=lambda node: order[node.mem_id])
+
+    def get_text(self, element):
+        return element.text(deep=True, separator='', strip=True)
+
+    def get_attribute(self, element, name, default=''):
+        value = element.attributes.get(name)
+        return default if value is None else value
+
+
+PARSER_CHOICES = [
+    ('html.parser', 'html.parser（標準ライブラリ）'),
+    ('lxml', 'lxml'),
+    ('selectolax', 'selectolax（高速）'),
+]
+
+_backends = {}
+
+
+def _create_backend(name):
+    if name == 'selectolax':
+        return SelectolaxBackend()
+    if name in ('html.parser', 'lxml'):
+        return BeautifulSoupBackend(name)
+    raise ValueError(f"Unknown HTML parser: {name}")
+
+
+def get_parser(name=None):
+    """解析バックエンドを取得
+
+    nameが空の場合は settings.SCRAPER_HTML_PARSER を使用する。
+    selectolaxがインストールされていない場合はlxmlにフォールバックする。
+    """
+    name = name or getattr(settings, 'SCRAPER_HTML_PARSER', 'lxml')
+
+    if name not in _backends:
+        try:
+            _backends[name] = _create_backend(name)
+        except ImportError:
+            logger.warning(f"HTML parser '{name}' is not available, falling back to lxml")
+            _backends[name] = get_parser('lxml')
+    return _backends[name]
@@ -0,0 +1,348 @@
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils import timezone
+from collections import Counter
+import datetime
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+# パーティションの単位（テーブル名の接尾辞の日付書式）
+PARTITION_INTERVALS = {
+    'month': '%Y%m',
+    'day': '%Y%m%d',
+}
+
+
+# 取得元ページのURL（取得元を記録する前のデータはURL）
+_SOURCE_URL_SQL = "coalesce(nullif(page_url, ''), url)"
+
+
+def _data_model():
+    from .models import ScrapedData
+    return ScrapedData
+
+
+def _interval():
+    interval = getattr(settings, 'SCRAPER_PARTITION_INTERVAL', 'month')
+    if interval not in PARTITION_INTERVALS:
+        raise ValueError(f'Invalid partition interval: {interval}')
+    return interval
+
+
+def _period_start(moment, interval):
+    moment = moment.astimezone(datetime.timezone.utc)
+    if interval == 'month':
+        return datetime.datetime(moment.year, moment.month, 1, tzinfo=datetime.timezone.utc)
+    return datetime.datetime(moment.year, moment.month, moment.day, tzinfo=datetime.timezone.utc)
+
+
+def _next_period(start, interval):
+    if interval == 'month':
+        if start.month == 12:
+            return start.replace(year=start.year + 1, month=1)
+        return start.replace(month=start.month + 1)
+    return start + datetime.timedelta(days=1)
+
+
+def _partition_name(table, start, interval):
+    return f'{table}_p{start:{PARTITION_INTERVALS[interval]}}'
+
+
+def _default_partition(table):
+    """どのパーティションの期間にも入らないデータを受け入れるデフォルトパーティション"""
+    return f'{table}_default'
+
+
+def _partition_range(table, name):
+    """パーティション名から期間（開始, 終了）を求める（命名規則に合わない場合はNone）"""
+    match = re.fullmatch(rf'{re.escape(table)}_p(\d{{6}}|\d{{8}})', name)
+    if not match:
+        return None
+    suffix = match.group(1)
+    interval = 'month' if len(suffix) == 6 else 'day'
+    start = datetime.datetime.strptime(suffix, PARTITION_INTERVALS[interval]).replace(tzinfo=datetime.timezone.utc)
+    return start, _next_period(start, interval)
+
+
+def is_partitioned(using='default'):
+    """スクレイピングデータのテーブルがパーティション化されているか（PostgreSQLのみ）"""
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)',
+            [_data_model()._meta.db_table]
+        )
+        return cursor.fetchone() is not None
+
+
+def list_partitions(using='default'):
+    """パーティションのテーブル名の一覧"""
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = to_regclass(%s) ORDER BY c.relname
+            """,
+            [_data_model()._meta.db_table]
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _create_partition(cursor, table, start, interval):
+    name = _partition_name(table, start, interval)
+    end = _next_period(start, interval)
+    cursor.execute(
+        f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {table} "
+        f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+    )
+    return name
+
+
+def _create_partition_from_default(cursor, table, start, interval):
+    """パーティションを作成（デフォルトパーティションに同じ期間のデータがある場合は移してから追加する）"""
+    default = _default_partition(table)
+    end = _next_period(start, interval)
+    cursor.execute(
+        f'SELECT 1 FROM {default} WHERE last_seen_at >= %s AND last_seen_at < %s LIMIT 1',
+        [start, end]
+    )
+    if cursor.fetchone() is None:
+        return _create_partition(cursor, table, start, interval)
+
+    # デフォルトパーティションに期間内のデータがあるとパーティションを作成できないため、
+    # 別のテーブルに移してからパーティションとして追加する
+    name = _partition_name(table, start, interval)
+    cursor.execute(f'CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS)')
+    cursor.execute(
+        f'WITH moved AS ('
+        f'DELETE FROM {default} WHERE last_seen_at >= %s AND last_seen_at < %s RETURNING *'
+        f') INSERT INTO {name} SELECT * FROM moved',
+        [start, end]
+    )
+    logger.info(f"Moved {cursor.rowcount} rows from {default} to {name}")
+    cursor.execute(
+        f"ALTER TABLE {table} ATTACH PARTITION {name} "
+        f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+    )
+    return name
+
+
+def create_partitions(using='default', until=None):
+    """現在から SCRAPER_PARTITION_PREMAKE 期間先までのパーティションを作成（作成済みの場合は何もしない）
+
+    デフォルトパーティションに入っていた同じ期間のデータは、作成したパーティションに移す。
+    パーティション化されていない場合は何もせず、作成したパーティションの数を返す。
+    """
+    if not is_partitioned(using):
+        return 0
+
+    connection = connections[using]
+    table = _data_model()._meta.db_table
+    interval = _interval()
+    existing = set(list_partitions(using))
+    create = _create_partition_from_default if _default_partition(table) in existing else _create_partition
+
+    start = _period_start(timezone.now(), interval)
+    if until is None:
+        until = start
+        for _ in range(getattr(settings, 'SCRAPER_PARTITION_PREMAKE', 2)):
+            until = _next_period(until, interval)
+
+    created = 0
+    while start <= until:
+        name = _partition_name(table, start, interval)
+        if name not in existing:
+            try:
+                with transaction.atomic(using=using), connection.cursor() as cursor:
+                    create(cursor, table, start, interval)
+                created += 1
+            except Exception as e:
+                logger.warning(f"Could not create partition {name}: {e}")
+        start = _next_period(start, interval)
+    return created
+
+
+def partition_scraped_data(using='default'):
+    """スクレイピングデータのテーブルを最終確認日時による範囲パーティションに変換し、移行した件数を返す
+
+    既存のテーブルの名前を変えて新しいテーブルにデータを複写するため、実行中はテーブル全体がロックされる。
+    """
+    from .models import ScrapingTarget
+    from .search import install_search_index
+
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        raise ValueError('Partitioning requires PostgreSQL')
+    if is_partitioned(using):
+        return 0
+
+    model = _data_model()
+    table = model._meta.db_table
+    old_table = f'{table}_unpartitioned'
+    interval = _interval()
+
+    with transaction.atomic(using=using):
+        with connection.cursor() as cursor:
+            cursor.execute(f'LOCK TABLE {table} IN ACCESS EXCLUSIVE MODE')
+            cursor.execute(f'ALTER TABLE {table} RENAME TO {old_table}')
+            cursor.execute(
+                f'CREATE TABLE {table} (LIKE {old_table} INCLUDING DEFAULTS INCLUDING IDENTITY) '
+                f'PARTITION BY RANGE (last_seen_at)'
+            )
+
+            # 既存データの期間と、期間外のデータを受け入れるデフォルトパーティション
+            cursor.execute(f'SELECT min(last_seen_at) FROM {old_table}')
+            oldest = cursor.fetchone()[0]
+            start = _period_start(oldest or timezone.now(), interval)
+            current = _period_start(timezone.now(), interval)
+            while start < current:
+                _create_partition(cursor, table, start, interval)
+                start = _next_period(start, interval)
+            cursor.execute(f'CREATE TABLE {_default_partition(table)} PARTITION OF {table} DEFAULT')
+        create_partitions(using)
+
+        with connection.cursor() as cursor:
+            cursor.execute(f'INSERT INTO {table} SELECT * FROM {old_table}')
+            count = cursor.rowcount
+            cursor.execute(f'DROP TABLE {old_table}')
+
+            # 主キーにはパーティションキーを含める必要がある
+            cursor.execute(f'ALTER TABLE {table} ADD PRIMARY KEY (id, last_seen_at)')
+            cursor.execute(
+                f'ALTER TABLE {table} ADD CONSTRAINT {table}_target_id_fk FOREIGN KEY (target_id) '
+                f'REFERENCES {ScrapingTarget._meta.db_table} (id) DEFERRABLE INITIALLY DEFERRED'
+            )
+            cursor.execute(
+                f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                f"(SELECT coalesce(max(id), 0) + 1 FROM {table}), false)"
+            )
+
+        with connection.schema_editor() as schema_editor:
+            for index in model._meta.indexes:
+                schema_editor.execute(index.create_sql(model, schema_editor))
+
+        install_search_index(using)
+
+    logger.info(f"Partitioned {table} by last_seen_at ({count} rows)")
+    return count
+
+
+def _drop_detached_partition(using, name):
+    """切り離したパーティションの件数を対象サイト毎のカウンターから減らして削除し、件数を返す"""
+    from .http_cache import invalidate_cache_entries
+    from .stats import increment_item_count
+
+    with transaction.atomic(using=using), connections[using].cursor() as cursor:
+        cursor.execute(f'SELECT target_id, count(*) FROM {name} GROUP BY target_id')
+        counts = cursor.fetchall()
+        for target_id, count in counts:
+            increment_item_count(target_id, -count)
+        cursor.execute(f'SELECT DISTINCT target_id, {_SOURCE_URL_SQL} FROM {name}')
+        invalidate_cache_entries(cursor.fetchall())
+        cursor.execute(f'DROP TABLE {name}')
+    return sum(count for _, count in counts)
+
+
+def drop_expired_partitions(cutoff, using='default'):
+    """期間の終わりがcutoff以前のパーティションを切り離して削除し、削除した件数を返す
+
+    行を1件ずつ削除せずにテーブルごと削除するため、WALやVACUUMの負荷が生じない。
+    期間がcutoffをまたぐパーティションは、期間が過ぎるまで残す。
+    """
+    connection = connections[using]
+    table = _data_model()._meta.db_table
+    attached = set(list_partitions(using))
+
+    deleted = 0
+    # 追加済みのパーティションはtable_names()に含まれないため別に取得し、
+    # 前回、切り離した後に削除できなかったパーティションも対象にする
+    for name in sorted(attached | set(connection.introspection.table_names())):
+        period = _partition_range(table, name)
+        if period is None or period[1] > cutoff:
+            continue
+        if name in attached:
+            # 親テーブルをロックするのはメタデータを変更する間だけにする
+            with transaction.atomic(using=using), connection.cursor() as cursor:
+                cursor.execute(f'ALTER TABLE {table} DETACH PARTITION {name}')
+        count = _drop_detached_partition(using, name)
+        logger.info(f"Dropped partition {name} ({count} rows)")
+        deleted += count
+    return deleted
+
+
+def delete_in_batches(queryset, batch_size=None):
+    """主キーの範囲を区切って少しずつ削除し、削除した件数を返す
+
+    1回の削除を小さなトランザクションに分け、ロックを長時間保持しないようにする。
+    スクレイピングデータの場合は対象サイト毎のカウンターを減らし、取得元ページの条件付きGETのキャッシュも削除する。
+    """
+    from .http_cache import invalidate_cache_entries
+    from .stats import increment_item_count
+
+    batch_size = batch_size or getattr(settings, 'SCRAPER_CLEANUP_BATCH_SIZE', 5000)
+    model = queryset.model
+    is_data = model is _data_model()
+    fields = ['pk', 'target_id', 'page_url', 'url'] if is_data else ['pk']
+
+    deleted = 0
+    while True:
+        with transaction.atomic(using=queryset.db):
+            rows = list(queryset.order_by().values_list(*fields)[:batch_size])
+            if not rows:
+                break
+            _, deleted_by_model = model.objects.using(queryset.db).filter(pk__in=[row[0] for row in rows]).delete()
+            if is_data:
+                counts = Counter(row[1] for row in rows)
+                for target_id, count in counts.items():
+                    increment_item_count(target_id, -count)
+                invalidate_cache_entries((row[1], row[2] or row[3]) for row in rows)
+        deleted += deleted_by_model.get(model._meta.label, 0)
+    return deleted
+
+
+def purge_default_partition(cutoff, using='default', batch_size=None):
+    """デフォルトパーティションにある最終確認日時がcutoffより前のデータを少しずつ削除し、削除した件数を返す
+
+    パーティションの作成が間に合わなかった期間のデータは、パーティションの削除では消えないため個別に削除する。
+    """
+    from .http_cache import invalidate_cache_entries
+    from .stats import increment_item_count
+
+    batch_size = batch_size or getattr(settings, 'SCRAPER_CLEANUP_BATCH_SIZE', 5000)
+    default = _default_partition(_data_model()._meta.db_table)
+    if default not in list_partitions(using):
+        return 0
+
+    deleted = 0
+    while True:
+        with transaction.atomic(using=using), connections[using].cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {default} WHERE id IN '
+                f'(SELECT id FROM {default} WHERE last_seen_at < %s LIMIT %s) RETURNING target_id, {_SOURCE_URL_SQL}',
+                [cutoff, batch_size]
+            )
+            rows = cursor.fetchall()
+            counts = Counter(target_id for target_id, _ in rows)
+            if not counts:
+                break
+            for target_id, count in counts.items():
+                increment_item_count(target_id, -count)
+            invalidate_cache_entries(rows)
+        deleted += sum(counts.values())
+    return deleted
+
+
+def purge_scraped_data(cutoff, using='default'):
+    """最終確認日時がcutoffより前のスクレイピングデータを削除し、削除した件数を返す
+
+    パーティション化されている場合は期限切れのパーティションとデフォルトパーティションの期限切れのデータを削除し、
+    そうでない場合（SQLiteなど）は少しずつ削除する。
+    """
+    if is_partitioned(using):
+        create_partitions(using)
+        return drop_expired_partitions(cutoff, using) + purge_default_partition(cutoff, using)
+    return delete_in_batches(_data_model().objects.using(using).filter(last_seen_at__lt=cutoff))
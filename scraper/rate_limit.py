@@ -0,0 +1,129 @@
+import asyncio
+import threading
+import time
+
+from .redis_utils import get_redis
+
+
+class TokenBucket:
+    """トークンバケット方式のレート制限"""
+
+    def __init__(self, rate, capacity=1):
+        # rate: 1秒あたりに補充されるトークン数（0以下の場合は無制限）
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self.tokens = float(self.capacity)
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self):
+        """トークンを1つ予約し、待機が必要な秒数を返す"""
+        with self._lock:
+            now = time.monotonic()
+            elapsed = now - self.updated_at
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+            self.updated_at = now
+
+            # 不足分は前借りし、補充されるまでの時間だけ待機させる
+            self.tokens -= 1
+            if self.tokens >= 0:
+                return 0
+            return -self.tokens / self.rate
+
+    def acquire(self):
+        """トークンを取得（同期版）"""
+        if self.rate <= 0:
+            return
+        wait = self._reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        """トークンを取得（asyncio版）"""
+        if self.rate <= 0:
+            return
+        wait = self._reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+class DomainRateLimiter:
+    """ドメイン毎にトークンバケットを管理するレート制限"""
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self.buckets = {}
+        self._lock = threading.Lock()
+
+    def get_bucket(self, domain):
+        """ドメインに対応するバケットを取得"""
+        with self._lock:
+            bucket = self.buckets.get(domain)
+            if bucket is None:
+                bucket = TokenBucket(self.rate, self.capacity)
+                self.buckets[domain] = bucket
+            return bucket
+
+    def set_rate(self, domain, rate, capacity=None):
+        """ドメイン毎にレートを変更（robots.txtのCrawl-delay等）"""
+        with self._lock:
+            self.buckets[domain] = TokenBucket(rate, capacity or self.capacity)
+
+    def acquire(self, domain):
+        self.get_bucket(domain).acquire()
+
+    async def acquire_async(self, domain):
+        await self.get_bucket(domain).acquire_async()
+
+
+# GCRA（Generic Cell Rate Algorithm）によるレート制限
+# KEYS[1]: 次の理論到着時刻を保存するキー
+# ARGV[1]: 送信間隔（秒）, ARGV[2]: バースト許容量（秒）
+# 戻り値: 待機すべき秒数（文字列）
+_GCRA_SCRIPT = """
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) + tonumber(now_parts[2]) / 1000000
+local interval = tonumber(ARGV[1])
+local tolerance = tonumber(ARGV[2])
+local tat = tonumber(redis.call('GET', KEYS[1]) or now)
+if tat < now then
+    tat = now
+end
+local wait = tat - tolerance - now
+if wait < 0 then
+    wait = 0
+end
+local new_tat = tat + interval
+redis.call('SET', KEYS[1], tostring(new_tat), 'PX', math.ceil((new_tat - now) * 1000) + 1000)
+return tostring(wait)
+"""
+
+
+class RedisRateLimiter:
+    """Redisで状態を共有するドメイン毎のレート制限
+
+    全ワーカーで同じドメインへのリクエスト間隔を揃えるために使用する。
+    """
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self._script = None
+
+    def _reserve(self, domain):
+        """枠を予約し、待機が必要な秒数を返す"""
+        if self._script is None:
+            self._script = get_redis().register_script(_GCRA_SCRIPT)
+
+        interval = 1.0 / self.rate
+        tolerance = interval * (self.capacity - 1)
+        wait = self._script(keys=[f'scraper:ratelimit:{domain}'], args=[interval, tolerance])
+        return float(wait)
+
+    def acquire(self, domain):
+        if self.rate <= 0:
+            return
+        wait = self._reserve(domain)
+        if wait > 0:
+            time.sleep(wait)
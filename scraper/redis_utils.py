@@ -0,0 +1,13 @@
+from django.conf import settings
+import redis
+
+_connection = None
+
+
+def get_redis():
+    """共有のRedis接続を取得（接続プールはプロセス内で使い回す）"""
+    global _connection
+    
+    if _connection is None:
+        _connection = redis.Redis.from_url(settings.REDIS_URL)
+    return _connection
@@ -0,0 +1,55 @@
+from django.conf import settings
+
+RENDER_PROFILE_CHOICES = [
+    ('full', 'すべて読み込む'),
+    ('light', '軽量（画像・動画・フォント・広告を除外）'),
+    ('text', 'テキストのみ（スタイルシートも除外）'),
+]
+
+# リソースの種類毎の拡張子
+RESOURCE_EXTENSIONS = {
+    'image': ['png', 'jpg', 'jpeg', 'gif', 'webp', 'avif', 'svg', 'ico', 'bmp'],
+    'media': ['mp4', 'webm', 'ogg', 'mp3', 'wav', 'm4a', 'mov', 'm3u8'],
+    'font': ['woff', 'woff2', 'ttf', 'otf', 'eot'],
+    'stylesheet': ['css'],
+}
+
+# プロファイル毎に読み込まないリソースの種類
+PROFILE_BLOCKED_RESOURCES = {
+    'full': [],
+    'light': ['image', 'media', 'font'],
+    'text': ['image', 'media', 'font', 'stylesheet'],
+}
+
+# 広告・アクセス解析のホスト（Chrome DevTools ProtocolのURLパターン形式）
+DEFAULT_BLOCKED_URL_PATTERNS = [
+    '*google-analytics.com*',
+    '*googletagmanager.com*',
+    '*doubleclick.net*',
+    '*googlesyndication.com*',
+    '*googleadservices.com*',
+    '*connect.facebook.net*',
+    '*hotjar.com*',
+    '*scorecardresearch.com*',
+    '*criteo.com*',
+    '*adnxs.com*',
+    '*amazon-adsystem.com*',
+]
+
+
+def build_blocked_url_patterns(profile, extra_patterns=''):
+    """レンダリングプロファイルからブロックするURLパターンのリストを作成
+
+    extra_patterns は改行区切りの追加パターン（対象サイト毎の設定）
+    """
+    patterns = []
+    for resource_type in PROFILE_BLOCKED_RESOURCES.get(profile, []):
+        for extension in RESOURCE_EXTENSIONS[resource_type]:
+            # クエリ付きのURL（例: logo.png?v=2）も対象にする
+            patterns.extend([f'*.{extension}', f'*.{extension}?*'])
+
+    if profile != 'full':
+        patterns.extend(getattr(settings, 'SELENIUM_BLOCKED_URL_PATTERNS', DEFAULT_BLOCKED_URL_PATTERNS))
+
+    patterns.extend(line.strip() for line in extra_patterns.splitlines() if line.strip())
+    return patterns
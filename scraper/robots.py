@@ -0,0 +1,70 @@
+from django.conf import settings
+from django.core.cache import cache
+from urllib.parse import urlparse
+from urllib.robotparser import RobotFileParser
+import logging
+
+logger = logging.getLogger(__name__)
+
+# アクセスを拒否された場合（401/403）にキャッシュする値
+_DISALLOW_ALL = '\x00disallow-all'
+
+
+class RobotsCache:
+    """ホスト毎のrobots.txt
+
+    取得したrobots.txtはDjangoのキャッシュにホスト毎に保存し、全ワーカーで共有する。
+    解析結果はインスタンス内に保持する。
+    """
+
+    def __init__(self, session, user_agent=None):
+        self.session = session
+        self.user_agent = user_agent or getattr(settings, 'SCRAPER_ROBOTS_USER_AGENT', '*')
+        self._parsers = {}
+
+    def _fetch(self, origin):
+        """robots.txtを取得（存在しない・取得できない場合は空＝全て許可）"""
+        try:
+            response = self.session.get(f'{origin}/robots.txt', timeout=10)
+        except Exception as e:
+            logger.warning(f"Failed to fetch robots.txt from {origin}: {str(e)}")
+            return ''
+
+        if response.status_code in (401, 403):
+            return _DISALLOW_ALL
+        if response.status_code >= 400:
+            return ''
+        return response.text
+
+    def get_parser(self, url):
+        """URLのホストに対応するrobots.txtの解析結果を取得"""
+        parsed = urlparse(url)
+        origin = f'{parsed.scheme}://{parsed.netloc}'
+
+        parser = self._parsers.get(origin)
+        if parser is None:
+            key = f'scraper:robots:{origin}'
+            text = cache.get(key)
+            if text is None:
+                text = self._fetch(origin)
+                cache.set(key, text, getattr(settings, 'SCRAPER_ROBOTS_CACHE_TTL', 60 * 60 * 24))
+
+            parser = RobotFileParser(f'{origin}/robots.txt')
+            if text == _DISALLOW_ALL:
+                parser.disallow_all = True
+            else:
+                parser.parse(text.splitlines())
+            self._parsers[origin] = parser
+        return parser
+
+    def can_fetch(self, url):
+        return self.get_parser(url).can_fetch(self.user_agent, url)
+
+    def crawl_delay(self, url):
+        """Crawl-delay（秒、指定がない場合はNone）"""
+        delay = self.get_parser(url).crawl_delay(self.user_agent)
+        return float(delay) if delay else None
+
+    def sitemaps(self, url):
+        """robots.txtに記載されたサイトマップのURLのリスト"""
+        return self.get_parser(url).site_maps() or []
@@ -1,23 +1,159 @@
 import requests
-from bs4 import BeautifulSoup
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry, make_headers
+from selenium.common.exceptions import TimeoutException, WebDriverException
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from django.conf import settings
+from django.core.cache import cache
+from .parsers import get_parser
+from .render_profiles import build_blocked_url_patterns
+from .throttle import AutoThrottle, CONNECTION_ERROR_STATUS
+from .webdriver_pool import get_webdriver_pool
+from urllib.parse import urljoin, urlparse
+import os
+import re
+import threading
 import time
 import logging
 
 logger = logging.getLogger(__name__)
 
+# 通信中のリクエストがなく、最後の通信（またはDOM変更）から一定時間経過したか判定
+# arguments[0]: 'network' または 'dom', arguments[1]: 静止とみなす時間（ミリ秒）
+_IDLE_SCRIPT = """
+var state = window.__scraperState;
+if (document.readyState !== 'complete') return false;
+if (!state) return true;
+if (arguments[0] === 'network') {
+    return state.pending <= 0 && performance.now() - state.lastRequestAt >= arguments[1];
+}
+return performance.now() - state.lastMutationAt >= arguments[1];
+"""
+
+# CSSセレクタに一致する要素のテキスト・リンクとページのHTMLを返す
+# arguments[0]: CSSセレクタ
+_EXTRACT_SCRIPT = """
+var items = Array.prototype.map.call(document.querySelectorAll(arguments[0]), function (element) {
+    var href = typeof element.href === 'string' ? element.href : element.getAttribute('href');
+    return {title: (element.innerText || '').trim(), url: href || ''};
+});
+return {items: items, html: document.documentElement.outerHTML};
+"""
+
+_http_session = None
+_http_session_pid = None
+_http_session_lock = threading.Lock()
+
+
+def _create_http_session():
+    """コネクションプールとリトライを設定したHTTPセッションを作成"""
+    retries = getattr(settings, 'SCRAPER_HTTP_MAX_RETRIES', 3)
+    retry = Retry(
+        total=retries,
+        connect=retries,
+        read=retries,
+        status=0,
+        backoff_factor=getattr(settings, 'SCRAPER_HTTP_BACKOFF_FACTOR', 0.5),
+        allowed_methods=['HEAD', 'GET'],
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=getattr(settings, 'SCRAPER_HTTP_POOL_CONNECTIONS', 10),
+        pool_maxsize=getattr(settings, 'SCRAPER_HTTP_POOL_MAXSIZE', 10),
+        max_retries=retry,
+    )
+    
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    # 利用可能な圧縮方式（gzip, deflate, brotliがあればbr）を通知
+    session.headers.update(make_headers(accept_encoding=True))
+    return session
+
+
+def get_http_session():
+    """ワーカープロセス内で共有するHTTPセッションを取得
+    
+    Keep-Aliveで接続を再利用するため、プロセス毎に1つのセッションを使い回す。
+    fork後の子プロセスでは親の接続を共有しないよう作り直す。
+    """
+    global _http_session, _http_session_pid
+    
+    with _http_session_lock:
+        if _http_session is None or _http_session_pid != os.getpid():
+            _http_session = _create_http_session()
+            _http_session_pid = os.getpid()
+        return _http_session
+
+
+def close_http_session():
+    """共有HTTPセッションを閉じる"""
+    global _http_session, _http_session_pid
+    
+    with _http_session_lock:
+        if _http_session is not None and _http_session_pid == os.getpid():
+            _http_session.close()
+        _http_session = None
+        _http_session_pid = None
+
+
+class FetchedPage:
+    """取得したページ（生データと解析済みツリー）"""
+    
+    def __init__(self, url, content, parser, not_modified=False):
+        self.url = url
+        self.content = content
+        self.parser = parser
+        # 条件付きGETで304が返った場合はTrue（contentはNone）
+        self.not_modified = not_modified
+        self._document = None
+    
+    @property
+    def document(self):
+        """解析済みツリー（初回アクセス時に一度だけ解析）"""
+        if self._document is None:
+            self._document = self.parser.parse(self.content)
+        return self._document
+    
+    def select(self, css_selector):
+        """CSSセレクタに一致する要素のリストを返す"""
+        return self.parser.select(self.document, css_selector)
+
 
 class ScrapingEngine:
     """スクレイピングエンジン"""
     
-    def __init__(self, use_selenium=False):
+    def __init__(self, use_selenium=False, html_parser=None, response_cache=None,
+                 wait_strategy='dom_idle', wait_selector='', wait_timeout=10.0, blocked_url_patterns=None,
+                 throttle=None):
         self.use_selenium = use_selenium
+        self.blocked_url_patterns = blocked_url_patterns or []
+        self.wait_strategy = wait_strategy
+        self.wait_selector = wait_selector
+        self.wait_timeout = wait_timeout
+        self.parser = get_parser(html_parser)
+        self.response_cache = response_cache
+        # レスポンスに応じたドメイン毎のレート制限（AutoThrottle、Noneの場合は調整しない）
+        self.throttle = throttle
         self.driver = None
+        self._pooled_driver = None
+        self.session = get_http_session()
+        
+    @classmethod
+    def for_target(cls, target, use_selenium=False, response_cache=None):
+        """対象サイトの設定からエンジンを作成"""
+        return cls(
+            use_selenium=use_selenium,
+            html_parser=target.html_parser,
+            response_cache=response_cache,
+            wait_strategy=target.wait_strategy,
+            wait_selector=target.wait_selector,
+            wait_timeout=target.wait_timeout,
+            blocked_url_patterns=build_blocked_url_patterns(target.render_profile, target.blocked_url_patterns),
+            throttle=AutoThrottle.for_target(target) if target.auto_throttle else None
+        )
         
     def __enter__(self):
         if self.use_selenium:
@@ -25,110 +161,280 @@ class ScrapingEngine:
         return self
         
     def __exit__(self, exc_type, exc_val, exc_tb):
-        if self.driver:
-            self.driver.quit()
+        if self._pooled_driver:
+            # ブラウザ自体が異常な場合は再利用しない
+            discard = exc_type is not None and issubclass(exc_type, WebDriverException)
+            if self.blocked_url_patterns and not discard:
+                # ブロック設定は対象サイト毎のため、次のジョブに持ち越さない
+                try:
+                    self.driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': []})
+                except WebDriverException:
+                    discard = True
+            get_webdriver_pool().release(self._pooled_driver, discard=discard)
+            self._pooled_driver = None
+            self.driver = None
     
     def _setup_selenium(self):
-        """Seleniumドライバーのセットアップ"""
-        chrome_options = Options()
-        chrome_options.add_argument('--headless')
-        chrome_options.add_argument('--no-sandbox')
-        chrome_options.add_argument('--disable-dev-shm-usage')
-        chrome_options.add_argument('--disable-gpu')
-        chrome_options.add_argument('--window-size=1920,1080')
-        chrome_options.add_argument('--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36')
+        """Seleniumドライバーのセットアップ（プールから起動済みのものを借りる）"""
+        self._pooled_driver = get_webdriver_pool().acquire()
+        self.driver = self._pooled_driver.driver
+        
+        # 抽出に不要なリソース（画像・フォント・広告など）を読み込まない
+        if self.blocked_url_patterns:
+            try:
+                self.driver.execute_cdp_cmd('Network.enable', {})
+                self.driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': self.blocked_url_patterns})
+            except WebDriverException:
+                # __exit__は呼ばれないため、ここでプールに返却する
+                get_webdriver_pool().release(self._pooled_driver, discard=True)
+                self._pooled_driver = None
+                self.driver = None
+                raise
+        
+    def _wait_until_ready(self, url, css_selector):
+        """待機方法に従ってページの描画完了を待つ
+        
+        最大待機時間を超えた場合は、その時点の内容で抽出を続ける
+        """
+        wait = WebDriverWait(self.driver, self.wait_timeout, poll_frequency=0.1)
+        quiet_ms = getattr(settings, 'SELENIUM_QUIET_PERIOD_MS', 500)
+        
+        try:
+            if self.wait_strategy == 'selector':
+                selector = self.wait_selector or css_selector
+                wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, selector)))
+            elif self.wait_strategy == 'network_idle':
+                wait.until(lambda driver: driver.execute_script(_IDLE_SCRIPT, 'network', quiet_ms))
+            elif self.wait_strategy == 'dom_idle':
+                wait.until(lambda driver: driver.execute_script(_IDLE_SCRIPT, 'dom', quiet_ms))
+            else:
+                wait.until(lambda driver: driver.execute_script('return document.readyState') == 'complete')
+        except TimeoutException:
+            logger.warning(f"Timed out waiting for {self.wait_strategy} after {self.wait_timeout}s: {url}")
+    
+    def build_page(self, content, url, not_modified=False):
+        """取得したHTMLをエンジンの解析バックエンドでラップ"""
+        return FetchedPage(url, content, self.parser, not_modified=not_modified)
+    
+    def extract_items(self, page, url, css_selector):
+        """解析済みページからCSSセレクタに一致する要素を抽出"""
+        elements = page.select(css_selector)
+        
+        results = []
+        for element in elements:
+            title = self.parser.get_text(element)
+            link = self.parser.get_attribute(element, 'href')
+            if link and not link.startswith('http'):
+                link = urljoin(url, link)
+            
+            results.append({
+                'title': title,
+                'content': title,
+                'url': link
+            })
         
-        # ChromiumDriverを使用（ARM64対応）
-        from selenium.webdriver.chrome.service import Service
-        service = Service('/usr/bin/chromedriver')
-        self.driver = webdriver.Chrome(service=service, options=chrome_options)
-        self.driver.implicitly_wait(getattr(settings, 'SELENIUM_TIMEOUT', 30))
+        return results
+    
+    def _get(self, url, headers):
+        """ページを取得し、レイテンシとステータスをスロットリングに反映
+        
+        429/503の場合はRetry-Afterの時刻まで待ってから再取得する。
+        """
+        if not self.throttle:
+            return self.session.get(url, headers=headers, timeout=30)
         
+        domain = urlparse(url).netloc
+        attempt = 0
+        while True:
+            started = time.monotonic()
+            try:
+                response = self.session.get(url, headers=headers, timeout=30)
+            except (requests.ConnectionError, requests.Timeout):
+                self.throttle.record(domain, time.monotonic() - started, CONNECTION_ERROR_STATUS)
+                raise
+            
+            delay = self.throttle.record(
+                domain,
+                response.elapsed.total_seconds(),
+                response.status_code,
+                response.headers.get('Retry-After')
+            )
+            if not self.throttle.should_retry(response.status_code, attempt):
+                return response
+            
+            logger.warning(f"Throttled by {domain} ({response.status_code}), retrying {url} (delay: {delay:.2f}s)")
+            response.close()
+            attempt += 1
+            self.throttle.acquire(domain)
+    
     def scrape_with_requests(self, url, css_selector):
-        """requestsとBeautifulSoupを使ったスクレイピング"""
+        """requestsとHTMLパーサーを使ったスクレイピング
+        
+        抽出結果と取得したページ（FetchedPage）のタプルを返す
+        """
         try:
             headers = {
                 'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
             }
-            response = requests.get(url, headers=headers, timeout=30)
-            response.raise_for_status()
+            if self.response_cache:
+                headers.update(self.response_cache.conditional_headers(url))
             
-            soup = BeautifulSoup(response.content, 'html.parser')
-            elements = soup.select(css_selector)
+            response = self._get(url, headers)
             
-            results = []
-            for element in elements:
-                title = element.get_text(strip=True)
-                link = element.get('href', '')
-                if link and not link.startswith('http'):
-                    from urllib.parse import urljoin
-                    link = urljoin(url, link)
-                
-                results.append({
-                    'title': title,
-                    'content': title,
-                    'url': link
-                })
+            # 前回から変更がない場合は解析せずに空の結果を返す
+            if response.status_code == 304:
+                logger.info(f"Not modified: {url}")
+                self.response_cache.mark_not_modified(url)
+                return [], self.build_page(None, url, not_modified=True)
+            
+            response.raise_for_status()
+            
+            if self.response_cache:
+                self.response_cache.store(url, response.headers, len(response.content))
             
-            return results
+            # 相対URLはリダイレクト後のURLを基準に解決する
+            page = self.build_page(response.content, response.url)
+            return self.extract_items(page, page.url, css_selector), page
             
         except Exception as e:
             logger.error(f"Requests scraping error for {url}: {str(e)}")
             raise
     
     def scrape_with_selenium(self, url, css_selector):
-        """Seleniumを使ったスクレイピング"""
+        """Seleniumを使ったスクレイピング
+        
+        抽出結果とレンダリング後のページ（FetchedPage）のタプルを返す
+        """
         try:
-            self.driver.get(url)
+            started = time.monotonic()
+            try:
+                self.driver.get(url)
+            except TimeoutException:
+                if self.throttle:
+                    self.throttle.record(urlparse(url).netloc, time.monotonic() - started, CONNECTION_ERROR_STATUS)
+                raise
+            self._pooled_driver.pages_served += 1
             
-            # ページの読み込み完了を待つ
-            WebDriverWait(self.driver, 30).until(
-                EC.presence_of_element_located((By.TAG_NAME, "body"))
-            )
+            # ステータスは取得できないため、読み込み時間のみ反映する
+            if self.throttle:
+                self.throttle.record(urlparse(url).netloc, time.monotonic() - started, 200)
             
-            # 少し待機（JSの実行時間を考慮）
-            time.sleep(2)
+            # ページの描画完了を待つ
+            self._wait_until_ready(url, css_selector)
             
-            elements = self.driver.find_elements(By.CSS_SELECTOR, css_selector)
+            # 要素毎にWebDriverへ問い合わせないよう、抽出結果とHTMLを1回のスクリプトで取得
+            extracted = self.driver.execute_script(_EXTRACT_SCRIPT, css_selector)
             
             results = []
-            for element in elements:
-                title = element.text.strip()
-                link = element.get_attribute('href') or ''
-                
+            for item in extracted['items']:
                 results.append({
-                    'title': title,
-                    'content': title,
-                    'url': link
+                    'title': item['title'],
+                    'content': item['title'],
+                    'url': item['url']
                 })
             
-            return results
+            # リンク抽出用にレンダリング後のHTMLを保持（解析は必要になるまで行わない）
+            page = self.build_page(extracted['html'], url)
+            return results, page
             
         except Exception as e:
             logger.error(f"Selenium scraping error for {url}: {str(e)}")
             raise
     
-    def scrape(self, url, css_selector):
-        """スクレイピング実行（メソッドを自動選択）"""
+    def scrape_page(self, url, css_selector):
+        """スクレイピング実行し、抽出結果と取得したページを返す"""
         if self.use_selenium:
             return self.scrape_with_selenium(url, css_selector)
         else:
             return self.scrape_with_requests(url, css_selector)
+    
+    def scrape(self, url, css_selector):
+        """スクレイピング実行（メソッドを自動選択）"""
+        results, _ = self.scrape_page(url, css_selector)
+        return results
+
+
+# SPAのマウントポイント（React / Vue / Next.js / Nuxt / Angularなど）
+_SPA_ROOT_PATTERN = re.compile(
+    rb'<(?:div|main|app-root)\b[^>]*(?:id=["\']?(?:root|app|__next|__nuxt|svelte)\b|ng-version|data-reactroot)',
+    re.IGNORECASE
+)
+_INVISIBLE_PATTERN = re.compile(rb'<(script|style|noscript|template)\b.*?</\1\s*>', re.IGNORECASE | re.DOTALL)
+_TAG_PATTERN = re.compile(rb'<[^>]+>')
+
+
+def looks_like_spa_shell(content):
+    """JavaScriptで描画される前提の空のHTML（SPAの外枠）かを判定"""
+    if not content:
+        return False
+    if isinstance(content, str):
+        content = content.encode('utf-8')
+    
+    text = _TAG_PATTERN.sub(b' ', _INVISIBLE_PATTERN.sub(b' ', content))
+    visible_chars = len(b''.join(text.split()).decode('utf-8', 'replace'))
+    threshold = getattr(settings, 'SCRAPER_SPA_TEXT_THRESHOLD', 200)
+    
+    if visible_chars < threshold:
+        return True
+    # マウントポイントがあり本文が少ない場合もSPAとみなす
+    return visible_chars < threshold * 5 and _SPA_ROOT_PATTERN.search(content) is not None
+
 
+def _scraping_method_cache_key(url):
+    return f'scraper:scraping_method:{urlparse(url).netloc.lower()}'
 
-def detect_scraping_method(url):
-    """URLに基づいてスクレイピング方法を判定"""
-    # JSが多用されているサイトではSeleniumを使用
-    js_heavy_domains = [
-        'twitter.com',
-        'facebook.com', 
-        'instagram.com',
-        'linkedin.com',
-        'spa-site.com'  # SPAサイトの例
-    ]
+
+def _probe_scraping_method(target):
+    """requestsで取得して結果を確認し、必要な場合のみSeleniumで再取得して判定
+    
+    Seleniumを使うべき場合はTrue、判定できなかった場合はNoneを返す
+    """
+    requests_results = []
+    try:
+        with ScrapingEngine.for_target(target) as engine:
+            requests_results, page = engine.scrape_page(target.url, target.css_selector)
+        if requests_results and not looks_like_spa_shell(page.content):
+            return False
+        logger.info(f"No static results or SPA shell detected, trying Selenium: {target.url}")
+    except Exception as e:
+        logger.info(f"Static fetch failed, trying Selenium: {target.url} ({str(e)})")
+    
+    try:
+        with ScrapingEngine.for_target(target, use_selenium=True) as engine:
+            selenium_results, _ = engine.scrape_page(target.url, target.css_selector)
+    except Exception as e:
+        logger.warning(f"Selenium probe failed for {target.url}: {str(e)}")
+        return False if requests_results else None
+    
+    # ブラウザで描画して結果が増える場合のみSeleniumを使う
+    return len(selenium_results) > len(requests_results)
+
+
+def detect_scraping_method(target):
+    """スクレイピング方法を判定（Seleniumを使う場合はTrue）
+    
+    自動判定の場合は、まず安価なrequestsで取得し、結果が得られないかSPAの外枠のみの
+    場合に限りSeleniumを試す。判定結果はドメイン毎に一定期間キャッシュする。
+    """
+    if target.scraping_method == 'requests':
+        return False
+    if target.scraping_method == 'selenium':
+        return True
+    
+    key = _scraping_method_cache_key(target.url)
+    cached = cache.get(key)
+    if cached is not None:
+        return cached == 'selenium'
     
-    for domain in js_heavy_domains:
-        if domain in url:
-            return True
+    use_selenium = _probe_scraping_method(target)
+    if use_selenium is None:
+        # 判定できなかった場合はキャッシュせず、次回また判定する
+        return False
     
-    return False 
\ No newline at end of file
+    logger.info(f"Detected scraping method for {urlparse(target.url).netloc}: {'selenium' if use_selenium else 'requests'}")
+    cache.set(
+        key,
+        'selenium' if use_selenium else 'requests',
+        getattr(settings, 'SCRAPER_METHOD_CACHE_TTL', 60 * 60 * 24)
+    )
+    return use_selenium
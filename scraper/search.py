@@ -0,0 +1,189 @@
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connections
+from django.db.models import F, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Cast
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+# SQLite（開発環境）で使うFTS5の仮想テーブル
+FTS_TABLE = 'scraper_scrapeddata_fts'
+
+
+def _data_table():
+    from .models import ScrapedData
+    return ScrapedData._meta.db_table
+
+
+def _search_config():
+    """PostgreSQLの全文検索設定（'simple' など）"""
+    config = getattr(settings, 'SCRAPER_SEARCH_CONFIG', 'simple')
+    if not re.fullmatch(r'[A-Za-z_][A-Za-z0-9_.]*', config):
+        raise ValueError(f'Invalid text search config: {config}')
+    return config
+
+
+def _postgresql_statements(table):
+    config = _search_config()
+    return [
+        # タイトルを本文より重く評価する
+        # パーティション化したテーブルで最終確認日時の更新により行が別のパーティションに移る場合は、
+        # 移動先でINSERTとしてトリガーが発火するため、計算済みの値があれば再計算しない
+        f"""
+        CREATE OR REPLACE FUNCTION {table}_search_update() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' AND NEW.search_vector IS NOT NULL THEN
+                RETURN NEW;
+            END IF;
+            NEW.search_vector :=
+                setweight(to_tsvector('{config}', coalesce(NEW.title, '')), 'A') ||
+                setweight(to_tsvector('{config}', coalesce(NEW.content, '')), 'B');
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+        """,
+        f'DROP TRIGGER IF EXISTS {table}_search_trigger ON {table}',
+        # 最終確認日時のみを更新するアップサートでは再計算しない
+        f"""
+        CREATE TRIGGER {table}_search_trigger
+        BEFORE INSERT OR UPDATE OF title, content ON {table}
+        FOR EACH ROW EXECUTE FUNCTION {table}_search_update()
+        """,
+        f'CREATE INDEX IF NOT EXISTS scraper_data_search_idx ON {table} USING gin (search_vector)',
+    ]
+
+
+def _sqlite_statements(table):
+    # trigramトークナイザーは単語を空白で区切らない日本語でも部分一致で検索できる
+    return [
+        f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE}
+        USING fts5(title, content, content='{table}', content_rowid='id', tokenize='trigram')
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_insert AFTER INSERT ON {table} BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, title, content) VALUES (new.id, new.title, new.content);
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_delete AFTER DELETE ON {table} BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, content) VALUES ('delete', old.id, old.title, old.content);
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_update AFTER UPDATE OF title, content ON {table} BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, content) VALUES ('delete', old.id, old.title, old.content);
+            INSERT INTO {FTS_TABLE}(rowid, title, content) VALUES (new.id, new.title, new.content);
+        END
+        """,
+    ]
+
+
+def install_search_index(using='default'):
+    """全文検索用のインデックスとトリガーを作成（何度実行してもよい）
+
+    PostgreSQLではtsvector列を挿入・更新時にトリガーで計算し、GINインデックスを作成する。
+    SQLiteではFTS5の仮想テーブルを作成し、トリガーで同期する。
+    作成済みの場合は何もしない。既存データの索引付けは rebuild_search_index で行う。
+    """
+    connection = connections[using]
+    table = _data_table()
+    if table not in connection.introspection.table_names():
+        return False
+
+    if connection.vendor == 'postgresql':
+        statements = _postgresql_statements(table)
+    elif connection.vendor == 'sqlite':
+        statements = _sqlite_statements(table)
+    else:
+        return False
+
+    with connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+    return True
+
+
+def rebuild_search_index(using='default', batch_size=10000):
+    """既存データの検索インデックスを作り直し、更新した件数を返す"""
+    from .models import ScrapedData
+
+    connection = connections[using]
+    table = _data_table()
+    install_search_index(using)
+
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+        return ScrapedData.objects.using(using).count()
+
+    if connection.vendor != 'postgresql':
+        return 0
+
+    # 長時間ロックしないよう、主キーの範囲毎にトリガーを発火させて計算する
+    updated = 0
+    last_id = 0
+    with connection.cursor() as cursor:
+        while True:
+            cursor.execute(
+                f"""
+                UPDATE {table} SET title = title
+                WHERE id IN (SELECT id FROM {table} WHERE id > %s ORDER BY id LIMIT %s)
+                RETURNING id
+                """,
+                [last_id, batch_size]
+            )
+            ids = [row[0] for row in cursor.fetchall()]
+            if not ids:
+                break
+            updated += len(ids)
+            last_id = max(ids)
+            logger.info(f"Indexed {updated} scraped data items for search")
+    return updated
+
+
+def _fts5_query(query):
+    """入力をFTS5のクエリに変換（各語をフレーズとして扱い、演算子として解釈させない）"""
+    terms = [term.replace('"', '""') for term in query.split()]
+    return ' '.join(f'"{term}"' for term in terms if term)
+
+
+def search_scraped_data(queryset, query):
+    """スクレイピングデータを全文検索し、関連度（rank）を付けて返す
+
+    PostgreSQLではウェブ検索形式（"フレーズ"、OR、-除外）のクエリを使える。
+    SQLiteでは3文字以上の語を部分一致で検索する。その他のデータベースでは単純な部分一致になる。
+    """
+    query = query.strip()
+    vendor = connections[queryset.db].vendor
+
+    if vendor == 'postgresql':
+        search_query = SearchQuery(query, config=_search_config(), search_type='websearch')
+        # ts_rankはreal（float4）を返すため、カーソルに含める値と比較できるようdouble precisionにする
+        return queryset.filter(search_vector=search_query).annotate(
+            rank=Cast(SearchRank(F('search_vector'), search_query), FloatField())
+        )
+
+    if vendor == 'sqlite':
+        match = _fts5_query(query)
+        if not match:
+            return queryset.none()
+        table = _data_table()
+        # bm25は関連度が高いほど小さな値を返すため符号を反転する（タイトルを重く評価）
+        return queryset.filter(
+            pk__in=RawSQL(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', (match,))
+        ).annotate(
+            rank=RawSQL(
+                f'SELECT -bm25({FTS_TABLE}, 2.0, 1.0) FROM {FTS_TABLE} '
+                f'WHERE {FTS_TABLE} MATCH %s AND rowid = {table}.id',
+                (match,),
+                output_field=FloatField()
+            )
+        )
+
+    return queryset.filter(Q(title__icontains=query) | Q(content__icontains=query)).annotate(
+        rank=Value(0.0, output_field=FloatField())
+    )
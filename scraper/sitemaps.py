@@ -0,0 +1,114 @@
+from collections import deque, namedtuple
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from xml.etree import ElementTree
+import datetime
+import logging
+import zlib
+
+logger = logging.getLogger(__name__)
+
+SitemapEntry = namedtuple('SitemapEntry', ['url', 'lastmod', 'priority'])
+
+_GZIP_MAGIC = b'\x1f\x8b'
+
+
+def _local_name(tag):
+    """名前空間を除いたタグ名"""
+    return tag.rsplit('}', 1)[-1]
+
+
+def _parse_lastmod(value):
+    """W3C Datetime形式のlastmodを日時に変換（解析できない場合はNone）"""
+    if not value:
+        return None
+    try:
+        lastmod = parse_datetime(value)
+        if lastmod is None:
+            date = parse_date(value)
+            if date is None:
+                return None
+            lastmod = datetime.datetime.combine(date, datetime.time())
+    except ValueError:
+        return None
+
+    if timezone.is_naive(lastmod):
+        lastmod = timezone.make_aware(lastmod, datetime.timezone.utc)
+    return lastmod
+
+
+def _parse_priority(value):
+    try:
+        return min(max(float(value), 0.0), 1.0)
+    except (TypeError, ValueError):
+        return None
+
+
+def _parse_sitemap(session, url):
+    """サイトマップを逐次解析し、('url' または 'sitemap', SitemapEntry) を返す
+
+    ファイル全体を読み込まずに解析するため、大きなサイトマップでもメモリ使用量は一定。
+    gzip圧縮されたサイトマップ（.xml.gz）にも対応する。
+    """
+    parser = ElementTree.XMLPullParser(events=('start', 'end'))
+    decompressor = None
+    root = None
+
+    with session.get(url, timeout=30, stream=True) as response:
+        response.raise_for_status()
+
+        # Content-Encodingによる圧縮はrequestsが展開する
+        for chunk in response.iter_content(chunk_size=64 * 1024):
+            if decompressor is None:
+                # ファイル自体がgzipの場合は展開しながら解析
+                decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS) if chunk[:2] == _GZIP_MAGIC else False
+            parser.feed(decompressor.decompress(chunk) if decompressor else chunk)
+
+            for event, element in parser.read_events():
+                if root is None:
+                    root = element
+                if event != 'end':
+                    continue
+
+                tag = _local_name(element.tag)
+                if tag in ('url', 'sitemap'):
+                    fields = {_local_name(child.tag): (child.text or '').strip() for child in element}
+                    if fields.get('loc'):
+                        yield tag, SitemapEntry(
+                            fields['loc'],
+                            _parse_lastmod(fields.get('lastmod')),
+                            _parse_priority(fields.get('priority')),
+                        )
+                    # 処理済みの要素は破棄
+                    root.clear()
+
+    parser.close()
+
+
+def iter_sitemap_urls(session, sitemap_urls, max_urls, max_sitemaps=50):
+    """サイトマップ（サイトマップインデックスを含む）に記載されたURLを順に返す"""
+    queue = deque(sitemap_urls)
+    seen = set()
+    url_count = 0
+
+    while queue and len(seen) < max_sitemaps:
+        sitemap_url = queue.popleft()
+        if sitemap_url in seen:
+            continue
+        seen.add(sitemap_url)
+
+        try:
+            for kind, entry in _parse_sitemap(session, sitemap_url):
+                if kind == 'sitemap':
+                    # サイトマップインデックスの場合は子のサイトマップを後で取得
+                    queue.append(entry.url)
+                    continue
+
+                yield entry
+                url_count += 1
+                if url_count >= max_urls:
+                    return
+        except Exception as e:
+            logger.warning(f"Failed to parse sitemap {sitemap_url}: {str(e)}")
+
+    logger.info(f"Found {url_count} URLs in {len(seen)} sitemaps")
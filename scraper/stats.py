@@ -0,0 +1,58 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, F, Sum
+from .models import ScrapingTarget, ScrapingJob
+import logging
+
+logger = logging.getLogger(__name__)
+
+DASHBOARD_STATS_KEY = 'scraper:dashboard_stats'
+
+
+def get_dashboard_stats():
+    """ダッシュボードの統計情報を取得
+
+    スクレイピングデータの件数はテーブルを数えずに対象サイト毎のカウンターの合計を使う。
+    結果は SCRAPER_DASHBOARD_STATS_TTL 秒キャッシュし、ジョブの開始・終了時に破棄する。
+    """
+    stats = cache.get(DASHBOARD_STATS_KEY)
+    if stats is None:
+        stats = {
+            'total_targets': ScrapingTarget.objects.filter(is_active=True).count(),
+            'total_scraped': ScrapingTarget.objects.aggregate(total=Sum('items_count'))['total'] or 0,
+            'running_jobs': ScrapingJob.objects.filter(status='running').count(),
+        }
+        cache.set(DASHBOARD_STATS_KEY, stats, getattr(settings, 'SCRAPER_DASHBOARD_STATS_TTL', 30))
+    return stats
+
+
+def invalidate_dashboard_stats():
+    cache.delete(DASHBOARD_STATS_KEY)
+
+
+def increment_item_count(target_id, count):
+    """対象サイトのスクレイピングデータ件数を増減"""
+    if count:
+        ScrapingTarget.objects.filter(pk=target_id).update(items_count=F('items_count') + count)
+
+
+def refresh_item_counts():
+    """対象サイト毎のスクレイピングデータ件数を数え直す
+
+    管理画面での削除など、タスクを経由しない変更で生じたずれを補正する（テーブル全体を集計するため定期実行用）。
+    集計中はロックを取らず、カウンターと実際の件数を1つのクエリ（同じスナップショット）で取得し、
+    その差分を加算する。集計中に保存・削除されたデータによる増減はカウンター側に残るため失われない。
+    """
+    rows = list(
+        ScrapingTarget.objects.annotate(actual=Count('scrapeddata')).values_list('id', 'items_count', 'actual')
+    )
+
+    updated = 0
+    for target_id, items_count, actual in rows:
+        if items_count != actual:
+            ScrapingTarget.objects.filter(pk=target_id).update(items_count=F('items_count') + (actual - items_count))
+            updated += 1
+
+    invalidate_dashboard_stats()
+    logger.info(f"Refreshed item counts for {len(rows)} targets ({updated} corrected)")
+    return updated
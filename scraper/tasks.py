@@ -1,74 +1,348 @@
-from celery import shared_task
+from celery import shared_task, chord
+from celery.exceptions import Retry
+from celery.signals import worker_process_shutdown, worker_shutdown
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
 from django.utils import timezone
-from .models import ScrapingTarget, ScrapedData, ScrapingJob
-from .scraping_utils import ScrapingEngine, detect_scraping_method
+from .models import ScrapingTarget, ScrapedData, ScrapingJob, CrawlCheckpoint, PageState
+from .scraping_utils import ScrapingEngine, detect_scraping_method, close_http_session
+from .webdriver_pool import close_webdriver_pool
 from .crawler import WebCrawler
+from .async_crawler import AsyncWebCrawler
+from .http_cache import ResponseCache, evict_cache_entries
+from .distributed import RedisCrawlFrontier
+from .locks import TargetLock
+from .partitions import delete_in_batches, purge_scraped_data
+from .stats import increment_item_count, invalidate_dashboard_stats, refresh_item_counts
+from .rate_limit import DomainRateLimiter, RedisRateLimiter
+from urllib.parse import urlparse
+from datetime import timedelta
+from collections import defaultdict
+from itertools import groupby
 import logging
+import random
 
 logger = logging.getLogger(__name__)
 
 
-@shared_task
-def scrape_target(target_id):
-    """指定されたターゲットをスクレイピングするタスク"""
+@worker_process_shutdown.connect
+@worker_shutdown.connect
+def _close_worker_resources(**kwargs):
+    """ワーカープロセス終了時に共有リソースを解放"""
+    close_http_session()
+    close_webdriver_pool()
+
+
+def save_scraped_items(target, results):
+    """スクレイピング結果を保存し、新規に追加された件数を返す
+    
+    フィンガープリントが一致する既存データは挿入せず、最終確認日時のみ更新する。
+    フィンガープリントには一意制約がないため、同じ対象サイトの保存は対象サイトの行をロックして直列化する
+    （分散クロールでは同じジョブのタスクが並行して保存する）。
+    """
+    now = timezone.now()
+    
+    # 同一バッチ内の重複を除去
+    scraped_items = {}
+    for result in results:
+        url = result.get('url', target.url)
+        fingerprint = ScrapedData.compute_fingerprint(target.id, url, result['title'], result['content'])
+        if fingerprint in scraped_items:
+            continue
+        scraped_items[fingerprint] = ScrapedData(
+            target=target,
+            title=result['title'],
+            content=result['content'],
+            url=url,
+            page_url=result.get('page_url', url),
+            depth=result.get('depth', 0),
+            scraped_at=now,
+            last_seen_at=now,
+            fingerprint=fingerprint
+        )
+    
+    if not scraped_items:
+        return 0
+    
+    with transaction.atomic():
+        # 件数のカウンターの更新でも同じ行をロックするため、保存の前に取得しておく
+        list(ScrapingTarget.objects.select_for_update().filter(pk=target.pk).values_list('pk'))
+        
+        existing = dict(
+            ScrapedData.objects.filter(fingerprint__in=scraped_items.keys())
+            .values_list('fingerprint', 'page_url')
+        )
+        
+        # 既存データの更新と新規データの挿入に分ける
+        if existing:
+            ScrapedData.objects.filter(fingerprint__in=existing).update(last_seen_at=now)
+            # 取得元を記録する前のデータには取得元ページのURLを補う
+            missing = defaultdict(list)
+            for fingerprint, page_url in existing.items():
+                if not page_url:
+                    missing[scraped_items[fingerprint].page_url].append(fingerprint)
+            for page_url, fingerprints in missing.items():
+                ScrapedData.objects.filter(fingerprint__in=fingerprints).update(page_url=page_url)
+        ScrapedData.objects.bulk_create(
+            [item for fingerprint, item in scraped_items.items() if fingerprint not in existing]
+        )
+    
+    return len(scraped_items) - len(existing)
+
+
+def touch_scraped_items(target, urls):
+    """変更がなかった（304）ページのデータの最終確認日時を更新
+    
+    本文を取得しないため、アップサートの代わりに取得元ページのURLで更新して保存期間の経過による削除を防ぐ
+    （取得元を記録する前のデータはURLで判定する）。
+    """
+    if urls:
+        ScrapedData.objects.filter(
+            Q(page_url__in=urls) | Q(page_url='', url__in=urls), target=target
+        ).update(last_seen_at=timezone.now())
+
+
+def save_page_states(target, pages):
+    """ページ毎の取得結果を記録し、次回訪問日時を更新
+    
+    pagesは (URL, 深度, 内容のハッシュ) のリスト（304の場合はハッシュがNone）
+    """
+    now = timezone.now()
+    
+    # 同じURLは最後の結果のみ使用
+    latest = {url: (depth, content_hash) for url, depth, content_hash in pages}
+    states = {
+        state.url: state
+        for state in PageState.objects.filter(target=target, url__in=latest.keys())
+    }
+    
+    new_states = []
+    for url, (depth, content_hash) in latest.items():
+        state = states.get(url)
+        if state is None:
+            state = PageState(target=target, url=url, depth=depth)
+            new_states.append(state)
+        state.record_visit(content_hash, now)
+    
+    fields = [
+        'content_hash', 'check_count', 'change_count', 'last_crawled_at',
+        'last_changed_at', 'recrawl_interval', 'next_crawl_at'
+    ]
+    PageState.objects.bulk_update(states.values(), fields)
+    # 並行するジョブが同じページを先に登録した場合は上書きする
+    PageState.objects.bulk_create(
+        new_states,
+        update_conflicts=True,
+        unique_fields=['target', 'url'],
+        update_fields=fields
+    )
+
+
+class BatchWriter:
+    """スクレイピング結果をバッチ毎に保存し、クロールのチェックポイントを記録する"""
+    
+    def __init__(self, target, job, batch_size, lock=None, response_cache=None):
+        self.target = target
+        self.job = job
+        self.batch_size = batch_size
+        # 実行中に延長する対象サイトのロック
+        self.lock = lock
+        # ページのアイテムを保存した後に検証子を保存する条件付きGET用のキャッシュ
+        self.response_cache = response_cache
+        self.buffer = []
+        self.pages = []
+        # 再開したジョブは前回までの取得件数から数える
+        self.total_count = job.items_scraped
+        self.new_count = 0
+    
+    def add(self, item):
+        self.buffer.append(item)
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+    
+    def record_page(self, url, depth, items, not_modified):
+        """ページの取得結果を記録（次回訪問日時の計算用、アイテムと一緒に保存）
+        
+        ページのアイテムを全て add した後に呼び出す。
+        """
+        content_hash = None if not_modified else PageState.compute_content_hash(items)
+        self.pages.append((url, depth, content_hash))
+        
+        if self.lock and not self.lock.refresh():
+            logger.warning(f"Lost the lock for {self.target.name} (job {self.job.id})")
+    
+    def flush(self):
+        """保留中のアイテムとページの取得結果を1トランザクションで保存"""
+        if not self.buffer and not self.pages:
+            return
+        
+        # 同じ内容は最終確認日時のみ更新
+        with transaction.atomic():
+            if self.buffer:
+                new_count = save_scraped_items(self.target, self.buffer)
+                self.new_count += new_count
+                ScrapingJob.objects.filter(pk=self.job.pk).update(
+                    items_scraped=F('items_scraped') + len(self.buffer)
+                )
+                increment_item_count(self.target.id, new_count)
+            if self.pages:
+                save_page_states(self.target, self.pages)
+                touch_scraped_items(self.target, [url for url, _, content_hash in self.pages if content_hash is None])
+                if self.response_cache:
+                    self.response_cache.commit([url for url, _, _ in self.pages])
+        self.total_count += len(self.buffer)
+        self.buffer = []
+        self.pages = []
+    
+    def checkpoint(self, state):
+        """保留中のアイテムを保存してからクロール状態を記録"""
+        self.flush()
+        CrawlCheckpoint.objects.update_or_create(
+            job=self.job,
+            defaults={
+                'frontier': state['frontier'],
+                'visited_urls': state['visited_urls'],
+                'pages_crawled': state['pages_crawled'],
+            }
+        )
+
+
+def _retry_countdown():
+    """同時実行数の上限で待機する秒数（一斉に再試行しないようジッターを加える）"""
+    delay = getattr(settings, 'SCRAPER_DISPATCH_RETRY_DELAY', 60)
+    return delay * random.uniform(0.5, 1.5)
+
+
+@shared_task(bind=True, max_retries=None)
+def scrape_target(self, target_id, batch_size=None, resume_job_id=None):
+    """指定されたターゲットをスクレイピングするタスク
+    
+    取得したアイテムはbatch_size件ずつ保存し、ジョブの取得件数も都度更新する。
+    resume_job_idを指定すると、そのジョブのチェックポイントからクロールを再開する。
+    同じターゲットのジョブが実行中の場合は何もせず、同時実行数の上限に達している場合は後で再試行する。
+    """
+    batch_size = batch_size or getattr(settings, 'SCRAPER_BATCH_SIZE', 500)
+    lock = None
+    
     try:
         target = ScrapingTarget.objects.get(id=target_id, is_active=True)
         
-        # ジョブレコードを作成
-        job = ScrapingJob.objects.create(
-            target=target,
-            status='running',
-            started_at=timezone.now()
-        )
+        lock = TargetLock(target.id, owner=resume_job_id)
+        lock_status = lock.acquire()
+        if lock_status != 'ok':
+            lock = None
+            if lock_status == 'busy':
+                logger.info(f"Too many running jobs, retrying {target.name} later")
+                raise self.retry(countdown=_retry_countdown())
+            logger.info(f"Skipping {target.name}: another job is already running")
+            return f"{target.name} is already being scraped"
+        
+        if resume_job_id:
+            # 中断したジョブを再開
+            job = ScrapingJob.objects.get(id=resume_job_id, target=target)
+            job.status = 'running'
+            job.completed_at = None
+            job.error_message = ''
+            job.save(update_fields=['status', 'completed_at', 'error_message'])
+        else:
+            # ジョブレコードを作成
+            job = ScrapingJob.objects.create(
+                target=target,
+                status='running',
+                started_at=timezone.now()
+            )
+            lock.bind(job.id)
+        invalidate_dashboard_stats()
+        
+        if target.enable_crawling and target.distributed_crawl:
+            # 分散クロールモード（ジョブの完了はdispatch_crawl_levelで記録する）
+            logger.info(f"Starting distributed crawl mode for {target.name}")
+            if resume_job_id:
+                # 前回の訪問済みURLが残っていると何も振り分けられずに完了となるため、開始URLからやり直す
+                # （取得済みのデータは最終確認日時のみ更新される）
+                RedisCrawlFrontier(job.id, target.max_pages).clear()
+            with ScrapingEngine.for_target(target) as scraper:
+                links = WebCrawler(target, scraper).initial_links()
+            # ロックはクロール完了時にdispatch_crawl_levelで解放する
+            lock = None
+            return dispatch_crawl_level([links], job.id, 0)
+        
+        checkpoint = CrawlCheckpoint.objects.filter(job=job).first()
         
         # スクレイピング方法を判定
-        use_selenium = detect_scraping_method(target.url)
+        use_selenium = detect_scraping_method(target)
+        
+        # 条件付きGET用のキャッシュ（Seleniumでは使用しない）
+        response_cache = None
+        if target.use_http_cache and not use_selenium:
+            response_cache = ResponseCache(target)
+        writer = BatchWriter(target, job, batch_size, lock=lock, response_cache=response_cache)
         
         # スクレイピング実行
-        with ScrapingEngine(use_selenium=use_selenium) as scraper:
+        with ScrapingEngine.for_target(target, use_selenium, response_cache) as scraper:
             if target.enable_crawling:
                 # クロールモード
                 logger.info(f"Starting crawl mode for {target.name}")
-                crawler = WebCrawler(target, scraper)
+                crawler_class = AsyncWebCrawler if target.async_crawl and not use_selenium else WebCrawler
+                crawler = crawler_class(
+                    target,
+                    scraper,
+                    checkpoint_callback=writer.checkpoint,
+                    checkpoint_interval=getattr(settings, 'SCRAPER_CHECKPOINT_INTERVAL', 20),
+                    page_callback=writer.record_page
+                )
+                if checkpoint:
+                    crawler.restore_state(checkpoint.get_state())
                 results = crawler.crawl()
             else:
                 # 単一ページモード
                 logger.info(f"Starting single page mode for {target.name}")
-                results = scraper.scrape(target.url, target.css_selector)
-                # 単一ページの場合はdepthを0に設定
+                results, page = scraper.scrape_page(target.url, target.css_selector)
+                # 単一ページの場合はdepthを0に設定し、取得元として開始URLを記録
                 for result in results:
                     result['depth'] = 0
+                    result['page_url'] = target.url
             
-            # データベースに保存
-            scraped_items = []
-            for result in results:
-                scraped_data = ScrapedData(
-                    target=target,
-                    title=result['title'],
-                    content=result['content'],
-                    url=result.get('url', target.url),
-                    depth=result.get('depth', 0),
-                    scraped_at=timezone.now()
-                )
-                scraped_items.append(scraped_data)
-            
-            # バルクインサート
-            ScrapedData.objects.bulk_create(scraped_items)
+            # バッチ毎にデータベースに保存
+            try:
+                for result in results:
+                    writer.add(result)
+            finally:
+                # 途中で失敗した場合もクローラーの後処理（接続のクローズ等）を確実に行う
+                if hasattr(results, 'close'):
+                    results.close()
+            if not target.enable_crawling:
+                writer.record_page(target.url, 0, results, page.not_modified)
+            writer.flush()
+            total_count = writer.total_count
+            new_count = writer.new_count
             
-            # ジョブ完了
+            # ジョブ完了（チェックポイントは不要になるため削除）
             job.status = 'completed'
             job.completed_at = timezone.now()
-            job.items_scraped = len(scraped_items)
+            job.items_scraped = total_count
             job.save()
+            CrawlCheckpoint.objects.filter(job=job).delete()
+            
+            if response_cache:
+                evict_cache_entries()
             
             mode = "crawl" if target.enable_crawling else "single page"
-            logger.info(f"Scraping completed for {target.name} ({mode}): {len(scraped_items)} items")
-            return f"Successfully scraped {len(scraped_items)} items from {target.name} ({mode})"
+            logger.info(f"Scraping completed for {target.name} ({mode}): {total_count} items ({new_count} new)")
+            return f"Successfully scraped {total_count} items from {target.name} ({mode})"
             
     except ScrapingTarget.DoesNotExist:
         logger.error(f"ScrapingTarget with id {target_id} not found")
         return f"Target {target_id} not found"
         
+    except ScrapingJob.DoesNotExist:
+        logger.error(f"ScrapingJob with id {resume_job_id} not found")
+        return f"Job {resume_job_id} not found"
+        
+    except Retry:
+        raise
+        
     except Exception as e:
         logger.error(f"Scraping failed for target {target_id}: {str(e)}")
         
@@ -77,40 +351,286 @@ def scrape_target(target_id):
             job.status = 'failed'
             job.completed_at = timezone.now()
             job.error_message = str(e)
-            job.save()
+            # 取得件数はバッチ保存時に更新済みのため上書きしない
+            job.save(update_fields=['status', 'completed_at', 'error_message'])
         
         raise
+    
+    finally:
+        if lock:
+            lock.release()
+        invalidate_dashboard_stats()
 
 
 @shared_task
-def scrape_all_active_targets():
-    """全ての有効なターゲットをスクレイピング"""
-    active_targets = ScrapingTarget.objects.filter(is_active=True)
+def crawl_page(job_id, url, depth):
+    """分散クロールで単一ページを取得するタスク
+    
+    取得したアイテムを保存し、次の深度で辿るリンクの [URL, 優先度] のリストを返す。
+    1ページの失敗でchord全体が止まらないよう、例外は記録して空のリストを返す。
+    """
+    try:
+        job = ScrapingJob.objects.select_related('target').get(id=job_id)
+        target = job.target
+        use_selenium = detect_scraping_method(target)
+        
+        response_cache = None
+        if target.use_http_cache and not use_selenium:
+            response_cache = ResponseCache(target)
+        
+        writer = BatchWriter(
+            target,
+            job,
+            getattr(settings, 'SCRAPER_BATCH_SIZE', 500),
+            lock=TargetLock(target.id, owner=job.id),
+            response_cache=response_cache
+        )
+        with ScrapingEngine.for_target(target, use_selenium, response_cache) as scraper:
+            crawler = WebCrawler(target, scraper)
+            
+            # 全ワーカーで共有するドメイン毎のレート制限（robots.txtのCrawl-delayを反映）
+            # 自動スロットリングはRedisで共有されるため、クローラーのレート制限をそのまま使う
+            rate_limiter = None
+            if not crawler.throttle:
+                rate_limiter = RedisRateLimiter(crawler.get_crawl_rate(url), target.rate_limit_burst)
+            
+            scraped_items, page, links = crawler.crawl_page(url, depth, rate_limiter)
+        
+        for item in scraped_items:
+            writer.add(item)
+        if page:
+            writer.record_page(url, depth, scraped_items, page.not_modified)
+        writer.flush()
+        
+        logger.info(f"Scraped {len(scraped_items)} items from {url} (depth: {depth})")
+        return links
+        
+    except Exception as e:
+        logger.error(f"Page scraping error for {url}: {e}")
+        return []
+
+
+@shared_task
+def dispatch_crawl_level(link_lists, job_id, depth):
+    """分散クロールで次の深度のページをタスクに振り分ける
+    
+    深度毎にchordを作成し、全ページの完了後に次の深度のリンクを集めて再度振り分ける。
+    最大ページ数に達する場合は優先度の高いリンクから振り分ける。
+    振り分けるページがなくなった時点でジョブを完了とする。
+    """
+    try:
+        job = ScrapingJob.objects.select_related('target').get(id=job_id)
+        target = job.target
+        frontier = RedisCrawlFrontier(job.id, target.max_pages)
+        
+        claimed = []
+        if depth <= target.max_depth:
+            links = sorted(
+                (link for links in link_lists for link in links),
+                key=lambda link: link[1],
+                reverse=True
+            )
+            claimed = frontier.claim([url for url, _ in links])
+        
+        if claimed:
+            logger.info(f"Dispatching {len(claimed)} pages at depth {depth} for {target.name}")
+            chord(
+                crawl_page.s(job.id, url, depth) for url in claimed
+            )(dispatch_crawl_level.s(job.id, depth + 1))
+            return f"Dispatched {len(claimed)} pages at depth {depth} for {target.name}"
+        
+        # クロール完了
+        pages = frontier.pages_claimed()
+        frontier.clear()
+        ScrapingJob.objects.filter(pk=job.pk).update(status='completed', completed_at=timezone.now())
+        TargetLock(target.id, owner=job.id).release()
+        invalidate_dashboard_stats()
+        job.refresh_from_db()
+        
+        logger.info(f"Distributed crawl completed for {target.name}: {pages} pages, {job.items_scraped} items")
+        return f"Successfully scraped {job.items_scraped} items from {target.name} (distributed crawl)"
+        
+    except Exception as e:
+        logger.error(f"Distributed crawl failed for job {job_id}: {str(e)}")
+        ScrapingJob.objects.filter(pk=job_id).update(
+            status='failed',
+            completed_at=timezone.now(),
+            error_message=str(e)
+        )
+        if 'job' in locals():
+            TargetLock(job.target_id, owner=job.id).release()
+        invalidate_dashboard_stats()
+        raise
+
+
+@shared_task
+def scrape_all_active_targets(window=None):
+    """全ての有効なターゲットをスクレイピング
+    
+    ワーカーやデータベースに負荷が集中しないよう、開始時刻をwindow秒の範囲に
+    ジッター付きで分散させる。実行中のターゲットは対象外とする。
+    """
+    if window is None:
+        window = getattr(settings, 'SCRAPER_DISPATCH_WINDOW', 600)
+    
+    active_targets = [
+        target for target in ScrapingTarget.objects.filter(is_active=True)
+        if not TargetLock(target.id).is_locked()
+    ]
+    random.shuffle(active_targets)
+    interval = window / len(active_targets) if active_targets else 0
     
     results = []
-    for target in active_targets:
-        result = scrape_target.delay(target.id)
-        results.append(f"Started scraping job for {target.name}: {result.id}")
+    for i, target in enumerate(active_targets):
+        countdown = i * interval + random.uniform(0, interval)
+        result = scrape_target.apply_async((target.id,), countdown=countdown)
+        results.append(f"Started scraping job for {target.name}: {result.id} (in {countdown:.0f}s)")
     
     return results
 
 
+@shared_task
+def schedule_recrawls(limit=None):
+    """再訪問の時期になったページを対象サイト毎にまとめて再取得タスクに振り分ける
+    
+    Celery Beatで定期的に実行する。各ページの次回訪問日時は更新頻度に応じて
+    PageState.record_visitで調整される。
+    """
+    limit = limit or getattr(settings, 'SCRAPER_RECRAWL_BATCH_SIZE', 1000)
+    pages_per_task = getattr(settings, 'SCRAPER_RECRAWL_PAGES_PER_TASK', 100)
+    now = timezone.now()
+    
+    due_pages = list(
+        PageState.objects.filter(next_crawl_at__lte=now, target__is_active=True)
+        .order_by('target_id', 'next_crawl_at')
+        .values_list('id', 'target_id', 'url', 'depth')[:limit]
+    )
+    if not due_pages:
+        return "No pages due for recrawl"
+    
+    # 取得が終わる前に再度振り分けられないよう、次回訪問日時を仮に延長
+    lease = getattr(settings, 'SCRAPER_RECRAWL_LEASE_SECONDS', 60 * 60)
+    PageState.objects.filter(id__in=[page[0] for page in due_pages]).update(
+        next_crawl_at=now + timedelta(seconds=lease)
+    )
+    
+    task_count = 0
+    for target_id, pages in groupby(due_pages, key=lambda page: page[1]):
+        pages = [[url, depth] for _, _, url, depth in pages]
+        for i in range(0, len(pages), pages_per_task):
+            recrawl_pages.delay(target_id, pages[i:i + pages_per_task])
+            task_count += 1
+    
+    logger.info(f"Scheduled {len(due_pages)} pages for recrawl in {task_count} tasks")
+    return f"Scheduled {len(due_pages)} pages for recrawl"
+
+
+@shared_task
+def recrawl_pages(target_id, pages):
+    """指定したページのみを再取得するタスク（リンクは辿らない）
+    
+    pagesは [URL, 深度] のリスト。取得に失敗したページは仮に延長した次回訪問日時のまま、
+    後で再度振り分けられる。ターゲットのジョブが実行中の場合も同様に後回しにする。
+    """
+    lock = None
+    try:
+        target = ScrapingTarget.objects.get(id=target_id, is_active=True)
+        
+        lock = TargetLock(target.id)
+        lock_status = lock.acquire()
+        if lock_status != 'ok':
+            lock = None
+            logger.info(f"Postponing recrawl of {target.name}: {lock_status}")
+            return f"Recrawl of {target.name} postponed"
+        
+        job = ScrapingJob.objects.create(
+            target=target,
+            status='running',
+            started_at=timezone.now()
+        )
+        lock.bind(job.id)
+        invalidate_dashboard_stats()
+        
+        use_selenium = detect_scraping_method(target)
+        response_cache = None
+        if target.use_http_cache and not use_selenium:
+            response_cache = ResponseCache(target)
+        writer = BatchWriter(
+            target, job, getattr(settings, 'SCRAPER_BATCH_SIZE', 500), lock=lock, response_cache=response_cache
+        )
+        
+        with ScrapingEngine.for_target(target, use_selenium, response_cache) as scraper:
+            rate_limiter = scraper.throttle or DomainRateLimiter(target.rate_limit, target.rate_limit_burst)
+            for url, depth in pages:
+                rate_limiter.acquire(urlparse(url).netloc)
+                try:
+                    results, page = scraper.scrape_page(url, target.css_selector)
+                except Exception as e:
+                    logger.error(f"Page scraping error for {url}: {e}")
+                    continue
+                
+                # scrape_targetと同じ形で保存し、フィンガープリントを一致させる
+                if target.enable_crawling:
+                    items = [
+                        {'title': result['title'], 'content': result['content'], 'url': url, 'depth': depth}
+                        for result in results
+                    ]
+                else:
+                    # 単一ページの場合はアイテムのリンクをURLとし、depthを0に設定
+                    items = [dict(result, depth=0, page_url=url) for result in results]
+                for item in items:
+                    writer.add(item)
+                writer.record_page(url, depth, items, page.not_modified)
+        
+        writer.flush()
+        job.status = 'completed'
+        job.completed_at = timezone.now()
+        job.items_scraped = writer.total_count
+        job.save()
+        
+        logger.info(f"Recrawled {len(pages)} pages for {target.name}: {writer.total_count} items ({writer.new_count} new)")
+        return f"Recrawled {len(pages)} pages for {target.name}"
+        
+    except ScrapingTarget.DoesNotExist:
+        logger.error(f"ScrapingTarget with id {target_id} not found")
+        return f"Target {target_id} not found"
+        
+    except Exception as e:
+        logger.error(f"Recrawl failed for target {target_id}: {str(e)}")
+        if 'job' in locals():
+            job.status = 'failed'
+            job.completed_at = timezone.now()
+            job.error_message = str(e)
+            job.save(update_fields=['status', 'completed_at', 'error_message'])
+        raise
+    
+    finally:
+        if lock:
+            lock.release()
+            invalidate_dashboard_stats()
+
+
 @shared_task
 def cleanup_old_data(days=30):
-    """古いスクレイピングデータをクリーンアップ"""
-    from datetime import timedelta
+    """古いスクレイピングデータをクリーンアップ
     
+    パーティション化されている場合は期限切れのパーティションを削除し、それ以外は少しずつ削除する。
+    """
     cutoff_date = timezone.now() - timedelta(days=days)
     
-    # 古いスクレイピングデータを削除
-    old_data = ScrapedData.objects.filter(scraped_at__lt=cutoff_date)
-    count = old_data.count()
-    old_data.delete()
+    # 一定期間取得されていないスクレイピングデータを削除し、件数のカウンターを減らす
+    count = purge_scraped_data(cutoff_date)
+    invalidate_dashboard_stats()
     
     # 古いジョブレコードも削除
-    old_jobs = ScrapingJob.objects.filter(started_at__lt=cutoff_date)
-    job_count = old_jobs.count()
-    old_jobs.delete()
+    job_count = delete_in_batches(ScrapingJob.objects.filter(started_at__lt=cutoff_date))
     
     logger.info(f"Cleaned up {count} old scraped data items and {job_count} old jobs")
-    return f"Cleaned up {count} items and {job_count} jobs older than {days} days" 
\ No newline at end of file
+    return f"Cleaned up {count} items and {job_count} jobs older than {days} days"
+
+
+@shared_task
+def refresh_dashboard_stats():
+    """対象サイト毎のデータ件数を数え直す（タスク以外で削除されたデータによるずれを補正）"""
+    updated = refresh_item_counts()
+    return f"Corrected item counts for {updated} targets"
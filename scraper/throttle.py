@@ -0,0 +1,198 @@
+from django.conf import settings
+from django.utils import timezone
+from email.utils import parsedate_to_datetime
+from asgiref.sync import sync_to_async
+from .redis_utils import get_redis
+import asyncio
+import time
+
+# サーバーが過負荷・アクセス過多を示すステータス（0は接続エラー・タイムアウト）
+THROTTLE_STATUSES = (429, 503)
+CONNECTION_ERROR_STATUS = 0
+
+# 次にリクエストを送信できる時刻を予約
+# KEYS[1]: ドメインの状態を保存するハッシュ
+# ARGV[1]: 初期間隔（秒）, ARGV[2]: 最小間隔（秒）, ARGV[3]: バースト数, ARGV[4]: 状態の有効期限（ミリ秒）
+# 戻り値: {待機すべき秒数, 推奨同時接続数}（文字列）
+_RESERVE_SCRIPT = """
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) + tonumber(now_parts[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'delay', 'next_at', 'blocked_until', 'concurrency')
+local delay = tonumber(state[1]) or tonumber(ARGV[1])
+local min_delay = tonumber(ARGV[2])
+if delay < min_delay then
+    delay = min_delay
+end
+local tat = tonumber(state[2]) or now
+if tat < now then
+    tat = now
+end
+local wait = tat - delay * (tonumber(ARGV[3]) - 1) - now
+if wait < 0 then
+    wait = 0
+end
+-- Retry-Afterで指定された時刻までは送信しない
+local blocked_until = tonumber(state[3]) or 0
+if blocked_until - now > wait then
+    wait = blocked_until - now
+    tat = blocked_until
+end
+redis.call('HSET', KEYS[1], 'next_at', tostring(tat + delay))
+redis.call('PEXPIRE', KEYS[1], ARGV[4])
+return {tostring(wait), tostring(state[4] or '')}
+"""
+
+# レスポンスの結果から間隔と同時接続数を更新
+# ARGV[1]: レイテンシ（秒）, ARGV[2]: ステータス, ARGV[3]: Retry-After（秒、指定なしは0）,
+# ARGV[4]: 初期間隔, ARGV[5]: 最小間隔, ARGV[6]: 最大間隔, ARGV[7]: 目標同時接続数,
+# ARGV[8]: 最大同時接続数, ARGV[9]: 状態の有効期限（ミリ秒）
+# 戻り値: {間隔, 推奨同時接続数}（文字列）
+_FEEDBACK_SCRIPT = """
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) + tonumber(now_parts[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'delay', 'concurrency', 'blocked_until')
+local latency = tonumber(ARGV[1])
+local status = tonumber(ARGV[2])
+local retry_after = tonumber(ARGV[3])
+local delay = tonumber(state[1]) or tonumber(ARGV[4])
+local max_concurrency = tonumber(ARGV[8])
+local concurrency = tonumber(state[2]) or max_concurrency
+
+if status == 0 or status == 429 or status == 503 then
+    -- 過負荷の兆候があれば間隔を倍に、同時接続数を半分にする
+    delay = delay * 2
+    concurrency = concurrency / 2
+    if retry_after > 0 and now + retry_after > (tonumber(state[3]) or 0) then
+        redis.call('HSET', KEYS[1], 'blocked_until', tostring(now + retry_after))
+    end
+else
+    -- レイテンシから求めた目標間隔に近づける（エラー時は間隔を縮めない）
+    local new_delay = (delay + latency / tonumber(ARGV[7])) / 2
+    if status < 400 or new_delay > delay then
+        delay = new_delay
+    end
+    if status < 400 then
+        concurrency = concurrency + 1 / concurrency
+    end
+end
+
+delay = math.min(math.max(delay, tonumber(ARGV[5])), tonumber(ARGV[6]))
+concurrency = math.min(math.max(concurrency, 1), max_concurrency)
+redis.call('HSET', KEYS[1], 'delay', tostring(delay), 'concurrency', tostring(concurrency))
+redis.call('PEXPIRE', KEYS[1], ARGV[9])
+return {tostring(delay), tostring(concurrency)}
+"""
+
+
+def parse_retry_after(value):
+    """Retry-Afterヘッダー（秒数またはHTTP日付）を秒数に変換（解析できない場合はNone）"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        return None
+    return max(0.0, (retry_at - timezone.now()).total_seconds())
+
+
+class AutoThrottle:
+    """レスポンスに応じてリクエスト間隔と同時接続数を調整するドメイン毎のレート制限
+
+    レイテンシが大きいほど間隔を広げ、429/503や接続エラーでは間隔を倍に、同時接続数を半分にする。
+    Retry-Afterが指定された場合はその時刻までリクエストを送信しない。
+    状態はRedisにドメイン毎に保存し、同じホストにアクセスする全タスクで共有する。
+    対象サイトのレート制限（およびrobots.txtのCrawl-delay）より速くはならない。
+    """
+
+    def __init__(self, rate, capacity=1, max_concurrency=1):
+        self.min_delay = 1.0 / rate if rate > 0 else 0.0
+        self.capacity = max(1, capacity)
+        self.max_concurrency = max(1, max_concurrency)
+        self.start_delay = max(self.min_delay, getattr(settings, 'SCRAPER_THROTTLE_START_DELAY', 1.0))
+        self.max_delay = max(self.min_delay, getattr(settings, 'SCRAPER_THROTTLE_MAX_DELAY', 60.0))
+        self.target_concurrency = max(0.1, getattr(settings, 'SCRAPER_THROTTLE_TARGET_CONCURRENCY', 1.0))
+        self.max_retry_after = getattr(settings, 'SCRAPER_THROTTLE_MAX_RETRY_AFTER', 300)
+        self.max_retries = getattr(settings, 'SCRAPER_THROTTLE_MAX_RETRIES', 2)
+        self.state_ttl = getattr(settings, 'SCRAPER_THROTTLE_STATE_TTL', 60 * 60 * 24)
+        # ドメイン毎の設定（robots.txtのCrawl-delay）と推奨同時接続数
+        self.domain_limits = {}
+        self.concurrency_limits = {}
+        self._scripts = {}
+
+    @classmethod
+    def for_target(cls, target):
+        return cls(target.rate_limit, target.rate_limit_burst, target.per_domain_concurrency)
+
+    def _run(self, script, domain, args):
+        if script not in self._scripts:
+            self._scripts[script] = get_redis().register_script(script)
+        return self._scripts[script](keys=[f'scraper:throttle:{domain}'], args=args)
+
+    def set_rate(self, domain, rate, capacity=None):
+        """ドメイン毎に最小間隔を変更（robots.txtのCrawl-delay等）"""
+        min_delay = 1.0 / rate if rate > 0 else 0.0
+        self.domain_limits[domain] = (max(self.min_delay, min_delay), capacity or self.capacity)
+
+    def _limits(self, domain):
+        return self.domain_limits.get(domain, (self.min_delay, self.capacity))
+
+    def _reserve(self, domain):
+        """送信枠を予約し、待機が必要な秒数を返す"""
+        min_delay, capacity = self._limits(domain)
+        wait, concurrency = self._run(_RESERVE_SCRIPT, domain, [
+            max(self.start_delay, min_delay),
+            min_delay,
+            capacity,
+            int(self.state_ttl * 1000),
+        ])
+        if concurrency:
+            self.concurrency_limits[domain] = float(concurrency)
+        return float(wait)
+
+    def acquire(self, domain):
+        wait = self._reserve(domain)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self, domain):
+        wait = await sync_to_async(self._reserve, thread_sensitive=False)(domain)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def record(self, domain, latency, status, retry_after=None):
+        """レスポンスの結果を反映し、更新後の間隔（秒）を返す
+
+        statusには接続エラー・タイムアウトの場合 CONNECTION_ERROR_STATUS を指定する。
+        retry_afterはRetry-Afterヘッダーの値（SCRAPER_THROTTLE_MAX_RETRY_AFTER 秒まで待機する）。
+        """
+        min_delay, _ = self._limits(domain)
+        retry_after = parse_retry_after(retry_after) if status in THROTTLE_STATUSES else None
+        delay, concurrency = self._run(_FEEDBACK_SCRIPT, domain, [
+            max(0.0, latency),
+            status,
+            min(retry_after or 0, self.max_retry_after),
+            max(self.start_delay, min_delay),
+            min_delay,
+            max(self.max_delay, min_delay),
+            self.target_concurrency,
+            self.max_concurrency,
+            int(self.state_ttl * 1000),
+        ])
+        self.concurrency_limits[domain] = float(concurrency)
+        return float(delay)
+
+    async def record_async(self, domain, latency, status, retry_after=None):
+        return await sync_to_async(self.record, thread_sensitive=False)(domain, latency, status, retry_after)
+
+    def concurrency(self, domain):
+        """ドメインへの推奨同時接続数"""
+        return int(self.concurrency_limits.get(domain, self.max_concurrency))
+
+    def should_retry(self, status, attempt):
+        """過負荷で取得できなかったページを待機後に再取得するか"""
+        return status in THROTTLE_STATUSES and attempt < self.max_retries
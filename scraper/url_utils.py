@@ -0,0 +1,83 @@
+from django.conf import settings
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode, quote
+import fnmatch
+import re
+
+DEFAULT_PORTS = {
+    'http': 80,
+    'https': 443,
+}
+
+# 内容に影響しないトラッキング用のクエリパラメータ（ワイルドカード可）
+DEFAULT_IGNORED_QUERY_PARAMS = [
+    'utm_*',
+    'gclid',
+    'fbclid',
+    'yclid',
+    'msclkid',
+    'mc_cid',
+    'mc_eid',
+    '_ga',
+]
+
+# パスで使用できる文字（RFC 3986 の unreserved / sub-delims / ':' '@' '/' と '%'）
+_PATH_SAFE_CHARS = "/:@!$&'()*+,;=-._~%"
+
+_PERCENT_ENCODED = re.compile(r'%([0-9A-Fa-f]{2})')
+_UNRESERVED_CHARS = frozenset('ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-._~')
+
+
+def _normalize_percent_encoding(match):
+    """unreservedな文字はデコードし、それ以外は16進数を大文字に統一"""
+    char = chr(int(match.group(1), 16))
+    if char in _UNRESERVED_CHARS:
+        return char
+    return '%' + match.group(1).upper()
+
+
+def _is_ignored_param(name, ignored_params):
+    return any(fnmatch.fnmatchcase(name.lower(), pattern) for pattern in ignored_params)
+
+
+def normalize_netloc(scheme, netloc):
+    """ホスト名を小文字にし、デフォルトポートを除去"""
+    scheme = scheme.lower()
+    userinfo, _, hostport = netloc.rpartition('@')
+    host, _, port = hostport.partition(':') if not hostport.startswith('[') else (hostport, '', '')
+    host = host.lower().rstrip('.')
+
+    if port.isdigit() and DEFAULT_PORTS.get(scheme) == int(port):
+        port = ''
+
+    netloc = host + (f':{port}' if port else '')
+    return f'{userinfo}@{netloc}' if userinfo else netloc
+
+
+def canonicalize_url(url, ignored_params=None):
+    """重複判定用にURLを正規化
+
+    - スキーム・ホスト名を小文字化し、デフォルトポートを除去
+    - フラグメント（#以降）を除去
+    - パスのパーセントエンコーディングを統一
+    - トラッキング用パラメータを除去し、クエリパラメータをソート
+
+    訪問済み判定のキーにのみ使い、取得やリンクの解決には元のURLを使う
+    （末尾のスラッシュはディレクトリを表し、相対リンクの解決結果が変わるため除去しない）。
+    """
+    if ignored_params is None:
+        ignored_params = getattr(settings, 'SCRAPER_IGNORED_QUERY_PARAMS', DEFAULT_IGNORED_QUERY_PARAMS)
+
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    netloc = normalize_netloc(scheme, parts.netloc)
+
+    path = quote(_PERCENT_ENCODED.sub(_normalize_percent_encoding, parts.path), safe=_PATH_SAFE_CHARS) or '/'
+
+    params = [
+        (name, value)
+        for name, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not _is_ignored_param(name, ignored_params)
+    ]
+    query = urlencode(sorted(params))
+
+    return urlunsplit((scheme, netloc, path, query, ''))
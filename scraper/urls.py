@@ -9,6 +9,9 @@ urlpatterns = [
     path('data/', views.scraped_data_list, name='data_list'),
     path('jobs/', views.job_list, name='job_list'),
     path('scrape/<int:target_id>/', views.start_scraping, name='start_scraping'),
+    path('jobs/<int:job_id>/resume/', views.resume_scraping, name='resume_scraping'),
     path('scrape-all/', views.start_all_scraping, name='start_all_scraping'),
     path('api/job/<int:job_id>/status/', views.api_job_status, name='api_job_status'),
+    path('api/search/', views.api_search, name='api_search'),
+    path('export/', views.export_data, name='export_data'),
 ] 
\ No newline at end of file
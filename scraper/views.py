@@ -1,75 +1,91 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib import messages
-from django.core.paginator import Paginator
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils import timezone
 from django.views.decorators.http import require_POST
+from .locks import TargetLock
 from .models import ScrapingTarget, ScrapedData, ScrapingJob
+from .export import EXPORT_FORMATS, export_queryset, iter_export
+from .pagination import CursorPaginator
+from .search import search_scraped_data
+from .stats import get_dashboard_stats
 from .tasks import scrape_target, scrape_all_active_targets
 
 
 def dashboard(request):
     """ダッシュボード画面"""
     targets = ScrapingTarget.objects.filter(is_active=True)
-    recent_jobs = ScrapingJob.objects.all()[:10]
-    recent_data = ScrapedData.objects.all()[:10]
-    
-    # 統計情報
-    total_targets = targets.count()
-    total_scraped = ScrapedData.objects.count()
-    running_jobs = ScrapingJob.objects.filter(status='running').count()
+    recent_jobs = ScrapingJob.objects.select_related('target').order_by('-id')[:10]
+    recent_data = ScrapedData.objects.select_related('target').defer('content', 'search_vector')[:10]
     
+    # 統計情報（件数はテーブルを数えずにカウンターから取得し、短時間キャッシュする）
     context = {
         'targets': targets,
         'recent_jobs': recent_jobs,
         'recent_data': recent_data,
-        'total_targets': total_targets,
-        'total_scraped': total_scraped,
-        'running_jobs': running_jobs,
+        **get_dashboard_stats(),
     }
     return render(request, 'scraper/dashboard.html', context)
 
 
 def target_list(request):
     """スクレイピング対象一覧"""
-    targets = ScrapingTarget.objects.all().order_by('-created_at')
-    paginator = Paginator(targets, 20)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    paginator = CursorPaginator(ScrapingTarget.objects.all(), 20, ordering=('-id',))
+    page_obj = paginator.get_page(request.GET.get('after'), request.GET.get('before'))
     
-    return render(request, 'scraper/target_list.html', {'page_obj': page_obj})
+    context = {
+        'page_obj': page_obj,
+        'estimated_count': paginator.estimated_count(),
+    }
+    return render(request, 'scraper/target_list.html', context)
 
 
 def scraped_data_list(request):
     """スクレイピングデータ一覧"""
     target_id = request.GET.get('target')
-    data = ScrapedData.objects.all()
+    query = request.GET.get('q', '').strip()
+    data = ScrapedData.objects.select_related('target').defer('search_vector')
     
     if target_id:
         data = data.filter(target_id=target_id)
     
-    data = data.order_by('-scraped_at')
-    paginator = Paginator(data, 50)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    if query:
+        # 全文検索の場合は関連度の高い順
+        data = search_scraped_data(data, query)
+        ordering = ('-rank', '-id')
+    else:
+        # OFFSETを使わずに取得日時のインデックスを辿る（深いページでも同じコスト）
+        ordering = ('-scraped_at', '-id')
+    paginator = CursorPaginator(data, 50, ordering=ordering)
+    page_obj = paginator.get_page(request.GET.get('after'), request.GET.get('before'))
     
     targets = ScrapingTarget.objects.all()
     
     context = {
         'page_obj': page_obj,
+        'estimated_count': paginator.estimated_count(),
         'targets': targets,
         'selected_target': int(target_id) if target_id else None,
+        'query': query,
     }
     return render(request, 'scraper/data_list.html', context)
 
 
 def job_list(request):
     """ジョブ一覧"""
-    jobs = ScrapingJob.objects.all().order_by('-started_at')
-    paginator = Paginator(jobs, 20)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    jobs = (
+        ScrapingJob.objects.select_related('target', 'crawlcheckpoint')
+        .defer('crawlcheckpoint__frontier', 'crawlcheckpoint__visited_urls')
+    )
+    # 開始日時はNULLを含むため、作成順（ID）で並べる
+    paginator = CursorPaginator(jobs, 20, ordering=('-id',))
+    page_obj = paginator.get_page(request.GET.get('after'), request.GET.get('before'))
     
-    return render(request, 'scraper/job_list.html', {'page_obj': page_obj})
+    context = {
+        'page_obj': page_obj,
+        'estimated_count': paginator.estimated_count(),
+    }
+    return render(request, 'scraper/job_list.html', context)
 
 
 @require_POST
@@ -77,13 +93,9 @@ def start_scraping(request, target_id):
     """個別スクレイピング開始"""
     target = get_object_or_404(ScrapingTarget, id=target_id, is_active=True)
     
-    # 既に実行中のジョブがないかチェック
-    running_job = ScrapingJob.objects.filter(
-        target=target, 
-        status='running'
-    ).first()
-    
-    if running_job:
+    # 既に実行中のジョブがないかチェック（異常終了したジョブのロックは有効期限で解除される）
+    # 重複の防止自体はタスク側でロックを取得して行う
+    if TargetLock(target.id).is_locked():
         messages.warning(request, f'{target.name} は既に実行中です。')
     else:
         # タスクをキューに追加
@@ -93,6 +105,20 @@ def start_scraping(request, target_id):
     return redirect('scraper:dashboard')
 
 
+@require_POST
+def resume_scraping(request, job_id):
+    """中断したジョブをチェックポイントから再開"""
+    job = get_object_or_404(ScrapingJob.objects.select_related('target'), id=job_id)
+    
+    if not job.is_resumable:
+        messages.warning(request, f'{job.target.name} のジョブ {job.id} は再開できません。')
+    else:
+        result = scrape_target.delay(job.target_id, resume_job_id=job.id)
+        messages.success(request, f'{job.target.name} のスクレイピングを再開しました。Job ID: {result.id}')
+    
+    return redirect('scraper:job_list')
+
+
 @require_POST 
 def start_all_scraping(request):
     """全ターゲットのスクレイピング開始"""
@@ -113,4 +139,82 @@ def api_job_status(request, job_id):
             'error_message': job.error_message,
         })
     except ScrapingJob.DoesNotExist:
-        return JsonResponse({'error': 'Job not found'}, status=404) 
\ No newline at end of file
+        return JsonResponse({'error': 'Job not found'}, status=404) 
+
+
+def api_search(request):
+    """スクレイピングデータの全文検索API
+
+    パラメータ: q（検索語、必須）、target（対象サイトID）、limit（件数、最大100）、after（次ページのカーソル）
+    """
+    query = request.GET.get('q', '').strip()
+    if not query:
+        return JsonResponse({'error': 'Parameter q is required'}, status=400)
+    
+    try:
+        limit = min(max(int(request.GET.get('limit', 20)), 1), 100)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid limit'}, status=400)
+    
+    data = ScrapedData.objects.select_related('target').defer('content', 'search_vector')
+    target_id = request.GET.get('target')
+    if target_id:
+        if not target_id.isdigit():
+            return JsonResponse({'error': 'Invalid target'}, status=400)
+        data = data.filter(target_id=target_id)
+    
+    paginator = CursorPaginator(search_scraped_data(data, query), limit, ordering=('-rank', '-id'))
+    page = paginator.get_page(request.GET.get('after'))
+    
+    return JsonResponse({
+        'query': query,
+        'results': [
+            {
+                'id': item.id,
+                'target': item.target.name,
+                'title': item.title,
+                'url': item.url,
+                'scraped_at': item.scraped_at.isoformat(),
+                'rank': item.rank,
+            }
+            for item in page
+        ],
+        'next': page.next_cursor,
+    })
+
+
+def export_data(request):
+    """スクレイピングデータのエクスポート（CSV / JSONL / Parquet）
+
+    パラメータ: format（csv・jsonl・parquet）、target（対象サイトID）、job（ジョブID）、
+    since・until（取得日時の範囲、YYYY-MM-DD または ISO 8601）
+    データベースから少しずつ読み出して送信するため、件数が多くてもメモリ使用量は一定。
+    """
+    export_format = request.GET.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return JsonResponse({'error': f'Unsupported format: {export_format}'}, status=400)
+    
+    for name in ('target', 'job'):
+        if request.GET.get(name) and not request.GET[name].isdigit():
+            return JsonResponse({'error': f'Invalid {name}'}, status=400)
+    
+    try:
+        queryset = export_queryset(
+            target_id=request.GET.get('target'),
+            job_id=request.GET.get('job'),
+            since=request.GET.get('since'),
+            until=request.GET.get('until'),
+        )
+        stream = iter_export(queryset, export_format)
+    except ScrapingJob.DoesNotExist:
+        return JsonResponse({'error': 'Job not found'}, status=404)
+    except ImportError:
+        return JsonResponse({'error': 'Parquet export requires pyarrow'}, status=501)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    content_type, extension = EXPORT_FORMATS[export_format]
+    filename = f"scraped_data_{timezone.localtime():%Y%m%d_%H%M%S}.{extension}"
+    response = StreamingHttpResponse(stream, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
@@ -0,0 +1,240 @@
+from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chrome.service import Service
+from django.conf import settings
+import os
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 全ページの読み込み前に実行し、通信中のリクエスト数とDOMの最終変更時刻を記録する
+# （ScrapingEngineの待機処理で参照）
+_PAGE_STATE_SCRIPT = """
+(function () {
+    var state = window.__scraperState = {pending: 0, lastRequestAt: 0, lastMutationAt: 0};
+    function started() { state.pending++; state.lastRequestAt = performance.now(); }
+    function finished() { state.pending--; state.lastRequestAt = performance.now(); }
+
+    if (window.fetch) {
+        var originalFetch = window.fetch;
+        window.fetch = function () {
+            started();
+            return originalFetch.apply(this, arguments).finally(finished);
+        };
+    }
+
+    var originalSend = XMLHttpRequest.prototype.send;
+    XMLHttpRequest.prototype.send = function () {
+        started();
+        this.addEventListener('loadend', finished);
+        return originalSend.apply(this, arguments);
+    };
+
+    new MutationObserver(function () {
+        state.lastMutationAt = performance.now();
+    }).observe(document, {childList: true, subtree: true, attributes: true, characterData: true});
+})();
+"""
+
+_webdriver_pool = None
+_webdriver_pool_pid = None
+_webdriver_pool_lock = threading.Lock()
+
+
+def create_chrome_driver():
+    """ヘッドレスChromeのWebDriverを起動"""
+    chrome_options = Options()
+    if getattr(settings, 'SELENIUM_HEADLESS', True):
+        chrome_options.add_argument('--headless')
+    chrome_options.add_argument('--no-sandbox')
+    chrome_options.add_argument('--disable-dev-shm-usage')
+    chrome_options.add_argument('--disable-gpu')
+    chrome_options.add_argument('--window-size=1920,1080')
+    chrome_options.add_argument('--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36')
+
+    # スクレイピングに不要な機能を無効化
+    chrome_options.add_argument('--disable-extensions')
+    chrome_options.add_argument('--disable-background-networking')
+    chrome_options.add_argument('--disable-component-update')
+    chrome_options.add_argument('--disable-default-apps')
+    chrome_options.add_argument('--disable-sync')
+    chrome_options.add_argument('--disable-features=Translate,MediaRouter,OptimizationHints')
+    chrome_options.add_argument('--mute-audio')
+    chrome_options.add_argument('--no-first-run')
+    chrome_options.add_experimental_option('prefs', {
+        'profile.default_content_setting_values.notifications': 2,
+        'profile.default_content_setting_values.geolocation': 2,
+        'profile.default_content_setting_values.automatic_downloads': 2,
+    })
+
+    # ChromiumDriverを使用（ARM64対応）
+    service = Service(getattr(settings, 'SELENIUM_DRIVER_PATH', '/usr/bin/chromedriver'))
+    driver = webdriver.Chrome(service=service, options=chrome_options)
+    # 要素が見つからない場合に待たされないよう暗黙の待機は使わない
+    driver.set_page_load_timeout(getattr(settings, 'SELENIUM_TIMEOUT', 30))
+    driver.execute_cdp_cmd('Page.addScriptToEvaluateOnNewDocument', {'source': _PAGE_STATE_SCRIPT})
+    return driver
+
+
+class PooledDriver:
+    """プールから貸し出したWebDriver"""
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.pages_served = 0
+        self.created_at = time.monotonic()
+
+
+class WebDriverPool:
+    """ワーカープロセス内で使い回すWebDriverのプール
+
+    起動済みのブラウザを再利用してChromeの起動コストを省く。
+    一定ページ数を処理した、またはメモリ使用量が増えたブラウザは破棄して作り直す。
+    """
+
+    def __init__(self, max_size=2, max_pages=200, max_memory_mb=1024, acquire_timeout=300):
+        self.max_size = max(1, max_size)
+        self.max_pages = max_pages
+        self.max_memory_mb = max_memory_mb
+        self.acquire_timeout = acquire_timeout
+        self._idle = []
+        self._size = 0
+        self._closed = False
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        """WebDriverを借りる（空きがない場合は返却されるまで待機）"""
+        deadline = time.monotonic() + self.acquire_timeout
+
+        while True:
+            with self._condition:
+                if self._closed:
+                    raise RuntimeError('WebDriver pool is closed')
+
+                if self._idle:
+                    pooled = self._idle.pop()
+                elif self._size < self.max_size:
+                    # 起動中も枠を確保しておく
+                    self._size += 1
+                    pooled = None
+                else:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise TimeoutError(f'No WebDriver available within {self.acquire_timeout} seconds')
+                    self._condition.wait(remaining)
+                    continue
+
+            if pooled is None:
+                try:
+                    return PooledDriver(create_chrome_driver())
+                except Exception:
+                    self._discard_slot()
+                    raise
+
+            if self._is_healthy(pooled):
+                return pooled
+
+            logger.info("Discarding unresponsive WebDriver")
+            self._quit(pooled)
+
+    def release(self, pooled, discard=False):
+        """WebDriverを返却（再利用できない場合は終了）"""
+        if discard or self._closed or self._should_recycle(pooled):
+            self._quit(pooled)
+            return
+
+        try:
+            # 次のジョブに前回のページやCookieを持ち越さない
+            pooled.driver.execute_cdp_cmd('Network.clearBrowserCookies', {})
+            pooled.driver.get('about:blank')
+        except WebDriverException:
+            self._quit(pooled)
+            return
+
+        with self._condition:
+            self._idle.append(pooled)
+            self._condition.notify()
+
+    def close(self):
+        """待機中のWebDriverを全て終了"""
+        with self._condition:
+            self._closed = True
+            idle, self._idle = self._idle, []
+
+        for pooled in idle:
+            self._quit(pooled)
+
+    def _is_healthy(self, pooled):
+        """ブラウザが応答するか確認"""
+        try:
+            pooled.driver.execute_script('return 1')
+            return True
+        except WebDriverException:
+            return False
+
+    def _memory_usage_mb(self, pooled):
+        """レンダラーのJSヒープ使用量（MB）"""
+        try:
+            used = pooled.driver.execute_script(
+                'return window.performance && performance.memory ? performance.memory.usedJSHeapSize : 0'
+            )
+            return (used or 0) / 1024 / 1024
+        except WebDriverException:
+            return 0
+
+    def _should_recycle(self, pooled):
+        if self.max_pages and pooled.pages_served >= self.max_pages:
+            logger.info(f"Recycling WebDriver after {pooled.pages_served} pages")
+            return True
+        if self.max_memory_mb:
+            memory = self._memory_usage_mb(pooled)
+            if memory >= self.max_memory_mb:
+                logger.info(f"Recycling WebDriver using {memory:.0f} MB")
+                return True
+        return False
+
+    def _quit(self, pooled):
+        try:
+            pooled.driver.quit()
+        except Exception as e:
+            logger.warning(f"Failed to quit WebDriver: {str(e)}")
+        finally:
+            self._discard_slot()
+
+    def _discard_slot(self):
+        with self._condition:
+            self._size -= 1
+            self._condition.notify()
+
+
+def get_webdriver_pool():
+    """ワーカープロセス内で共有するWebDriverプールを取得
+
+    fork後の子プロセスでは親のブラウザを共有しないよう作り直す。
+    """
+    global _webdriver_pool, _webdriver_pool_pid
+
+    with _webdriver_pool_lock:
+        if _webdriver_pool is None or _webdriver_pool_pid != os.getpid():
+            _webdriver_pool = WebDriverPool(
+                max_size=getattr(settings, 'SELENIUM_POOL_MAX_SIZE', 2),
+                max_pages=getattr(settings, 'SELENIUM_DRIVER_MAX_PAGES', 200),
+                max_memory_mb=getattr(settings, 'SELENIUM_DRIVER_MAX_MEMORY_MB', 1024),
+                acquire_timeout=getattr(settings, 'SELENIUM_POOL_ACQUIRE_TIMEOUT', 300),
+            )
+            _webdriver_pool_pid = os.getpid()
+        return _webdriver_pool
+
+
+def close_webdriver_pool():
+    """共有WebDriverプールを閉じる"""
+    global _webdriver_pool, _webdriver_pool_pid
+
+    with _webdriver_pool_lock:
+        if _webdriver_pool is not None and _webdriver_pool_pid == os.getpid():
+            _webdriver_pool.close()
+        _webdriver_pool = None
+        _webdriver_pool_pid = None
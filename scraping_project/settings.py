@@ -139,6 +139,107 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
 
+# Cache Configuration（ワーカー間で共有するためRedisを使用）
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+    }
+}
+
 # Selenium Configuration
 SELENIUM_HEADLESS = True
-SELENIUM_TIMEOUT = 30 
\ No newline at end of file
+SELENIUM_TIMEOUT = 30  # ページ読み込みの最大秒数
+SCRAPER_METHOD_CACHE_TTL = 60 * 60 * 24  # ドメイン毎の取得方法（requests / Selenium）の判定結果を保持する秒数
+SCRAPER_SPA_TEXT_THRESHOLD = 200  # 本文の文字数がこれ未満のHTMLはSPAの外枠とみなしてSeleniumを試す
+SELENIUM_QUIET_PERIOD_MS = 500  # 通信・DOM変更がこの時間止まったら描画完了とみなす
+SELENIUM_DRIVER_PATH = '/usr/bin/chromedriver'
+SELENIUM_POOL_MAX_SIZE = 2  # ワーカープロセス毎に起動しておくブラウザの最大数
+SELENIUM_POOL_ACQUIRE_TIMEOUT = 300  # ブラウザの空きを待つ最大秒数
+SELENIUM_DRIVER_MAX_PAGES = 200  # このページ数を処理したブラウザは作り直す
+SELENIUM_DRIVER_MAX_MEMORY_MB = 1024  # JSヒープがこの値を超えたブラウザは作り直す
+# 軽量プロファイルで読み込まない広告・アクセス解析のURLパターン
+SELENIUM_BLOCKED_URL_PATTERNS = [
+    '*google-analytics.com*', '*googletagmanager.com*', '*doubleclick.net*',
+    '*googlesyndication.com*', '*googleadservices.com*', '*connect.facebook.net*',
+    '*hotjar.com*', '*scorecardresearch.com*', '*criteo.com*', '*adnxs.com*',
+    '*amazon-adsystem.com*',
+]
+
+# HTTP Client Configuration
+SCRAPER_HTTP_POOL_CONNECTIONS = 10  # プールするホスト数
+SCRAPER_HTTP_POOL_MAXSIZE = 10  # ホスト毎の最大接続数
+SCRAPER_HTTP_MAX_RETRIES = 3  # 接続・読み込みエラー時のリトライ回数
+SCRAPER_HTTP_BACKOFF_FACTOR = 0.5  # リトライ間隔の係数（0.5, 1, 2秒...）
+SCRAPER_HTTP_CACHE_MAX_ENTRIES = 100000  # 条件付きGET用キャッシュの最大件数（古いものから削除）
+
+# HTML Parser Configuration
+# 'html.parser', 'lxml', 'selectolax' から選択（対象サイト毎に上書き可能）
+SCRAPER_HTML_PARSER = 'lxml'
+
+# Persistence Configuration
+SCRAPER_BATCH_SIZE = 500  # スクレイピング結果を保存する1トランザクションあたりの件数
+SCRAPER_CHECKPOINT_INTERVAL = 20  # クロール状態を保存する間隔（ページ数）
+SCRAPER_CHECKPOINT_STALE_SECONDS = 600  # 実行中のままこの秒数更新がないジョブは中断とみなして再開可能にする
+
+# Crawl Configuration
+# 重複判定時に無視するクエリパラメータ（ワイルドカード可）
+SCRAPER_IGNORED_QUERY_PARAMS = ['utm_*', 'gclid', 'fbclid', 'yclid', 'msclkid', 'mc_cid', 'mc_eid', '_ga']
+SCRAPER_BLOOM_FILTER_THRESHOLD = 100000  # 最大ページ数がこの値以上の場合は訪問済みURLをBloomフィルターで管理
+SCRAPER_BLOOM_FILTER_ERROR_RATE = 0.001  # Bloomフィルターの誤判定率
+# 未訪問キューの優先度（スコアの合計が高いURLから取得）
+SCRAPER_FRONTIER_SCORERS = [
+    'scraper.frontier.DepthScorer',
+    'scraper.frontier.PatternScorer',
+    'scraper.frontier.ParentYieldScorer',
+    'scraper.frontier.SitemapPriorityScorer',
+    'scraper.frontier.LastmodScorer',
+]
+SCRAPER_FRONTIER_DEPTH_WEIGHT = 1.0  # 深度1毎に減点
+SCRAPER_FRONTIER_PATTERN_BOOST = 5.0  # 優先パターンに加点・後回しパターンに減点
+SCRAPER_FRONTIER_PARENT_YIELD_WEIGHT = 2.0  # アイテムが取得できたページからのリンクに加点
+SCRAPER_FRONTIER_SITEMAP_WEIGHT = 2.0  # サイトマップのpriority（0〜1）に掛ける係数
+SCRAPER_FRONTIER_LASTMOD_WEIGHT = 1.0  # サイトマップのlastmodが新しいページに加点
+SCRAPER_FRONTIER_LASTMOD_DAYS = 30  # lastmodがこの日数より古いページは加点しない
+SCRAPER_ROBOTS_USER_AGENT = '*'  # robots.txtの判定に使うUser-agent
+SCRAPER_ROBOTS_CACHE_TTL = 60 * 60 * 24  # robots.txtをキャッシュする秒数
+SCRAPER_SITEMAP_MAX_SITEMAPS = 50  # サイトマップインデックスから取得するサイトマップの最大数
+
+# Recrawl Configuration（ページ毎の更新頻度に応じた再取得）
+SCRAPER_RECRAWL_INITIAL_INTERVAL = 60 * 60 * 24  # 初回取得後の再訪問間隔（秒）
+SCRAPER_RECRAWL_MIN_INTERVAL = 60 * 15  # 再訪問間隔の下限（秒）
+SCRAPER_RECRAWL_MAX_INTERVAL = 60 * 60 * 24 * 30  # 再訪問間隔の上限（秒）
+SCRAPER_RECRAWL_SPEEDUP_FACTOR = 0.5  # 内容が変わっていた場合に間隔に掛ける係数
+SCRAPER_RECRAWL_BACKOFF_FACTOR = 1.5  # 内容が変わっていなかった場合に間隔に掛ける係数
+SCRAPER_RECRAWL_BATCH_SIZE = 1000  # 1回の振り分けで対象とする最大ページ数
+SCRAPER_RECRAWL_PAGES_PER_TASK = 100  # 1タスクで再取得するページ数
+SCRAPER_RECRAWL_LEASE_SECONDS = 60 * 60  # 振り分け後、取得に失敗したページを再度振り分けるまでの秒数
+
+# Job Dispatch Configuration（ジョブの重複防止と同時実行数の制限）
+SCRAPER_TARGET_LOCK_TTL = 60 * 10  # 対象サイト毎のロックの有効期限（秒、実行中は自動で延長）
+SCRAPER_MAX_CONCURRENT_JOBS = 4  # 全ワーカーで同時に実行するジョブの最大数（0で無制限）
+SCRAPER_DISPATCH_WINDOW = 60 * 10  # 定期実行で全ターゲットの開始時刻を分散させる範囲（秒）
+SCRAPER_DISPATCH_RETRY_DELAY = 60  # 同時実行数の上限に達した場合に再試行するまでの目安（秒）
+
+# Auto Throttle Configuration（応答に応じたドメイン毎のリクエスト間隔の自動調整）
+SCRAPER_THROTTLE_START_DELAY = 1.0  # ドメインに初めてアクセスする際のリクエスト間隔（秒）
+SCRAPER_THROTTLE_MAX_DELAY = 60.0  # リクエスト間隔の上限（秒）
+SCRAPER_THROTTLE_TARGET_CONCURRENCY = 1.0  # 1ドメインあたり平均して並列に処理させたいリクエスト数
+SCRAPER_THROTTLE_MAX_RETRY_AFTER = 60 * 5  # Retry-Afterに従って待機する最大秒数
+SCRAPER_THROTTLE_MAX_RETRIES = 2  # 429/503で取得できなかったページを再取得する回数
+SCRAPER_THROTTLE_STATE_TTL = 60 * 60 * 24  # ドメイン毎の調整結果を保持する秒数
+
+# Dashboard Configuration
+SCRAPER_DASHBOARD_STATS_TTL = 30  # ダッシュボードの統計情報をキャッシュする秒数
+
+# Full-text Search Configuration
+SCRAPER_SEARCH_CONFIG = 'simple'  # PostgreSQLの全文検索設定（日本語の形態素解析には拡張機能の設定を指定）
+
+# Export Configuration
+SCRAPER_EXPORT_CHUNK_SIZE = 2000  # エクスポート時に1回で読み出す件数（Parquetでは行グループの件数）
+SCRAPER_EXPORT_PARQUET_COMPRESSION = 'zstd'  # Parquetの圧縮方式
+
+# Retention Configuration（cleanup_old_data によるデータの削除）
+SCRAPER_PARTITION_INTERVAL = 'month'  # パーティションの単位（'month' または 'day'、PostgreSQLでパーティション化した場合）
+SCRAPER_PARTITION_PREMAKE = 2  # 事前に作成しておく今後のパーティションの数
+SCRAPER_CLEANUP_BATCH_SIZE = 5000  # パーティション化していない場合に1トランザクションで削除する件数